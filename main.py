@@ -1,24 +1,220 @@
+import logging
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from urllib3.exceptions import NewConnectionError
+from requests_toolbelt import MultipartEncoder
 import os
+import json
+import hashlib
+import shutil
 import time
 import re
-from datetime import datetime
+from datetime import datetime, timedelta
 from zoneinfo import ZoneInfo
 from dotenv import load_dotenv
-from bs4 import BeautifulSoup
-from camoufox.sync_api import Camoufox
-import base64
+from contextlib import nullcontext, suppress
+from functools import lru_cache
+from lxml import etree, html as lxml_html
 import threading
-from http.server import HTTPServer, SimpleHTTPRequestHandler
+from urllib.parse import urlencode
+from html import unescape
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
 
 
 # Define India Standard Time
 IST = ZoneInfo("Asia/Kolkata")
 
+logger = logging.getLogger("phc_notifier")
+
+# Extra levels so console output keeps its familiar [OK] / [SKIP] / [WARN] tags
+OK = 25
+SKIP = 21
+logging.addLevelName(OK, "OK")
+logging.addLevelName(SKIP, "SKIP")
+logging.addLevelName(logging.WARNING, "WARN")
+
+# Date patterns used to find the cause list date (compiled once at import).
+# A single pattern serves both the header lookup and the full-text scan.
+DATE_PATTERN = re.compile(r'(?<!\d)(\d{1,2}[-/]\d{1,2}[-/]\d{4})(?!\d)')
+
+# International phone number as the Cloud API / wa.me expect it (digits, optional +)
+PHONE_NUMBER_PATTERN = re.compile(r'\+?\d{7,15}')
+# Formatting people type into numbers ("+91 98765-43210", "(0612) 1234567")
+PHONE_FORMATTING_PATTERN = re.compile(r'[\s\-().]')
+
+# (connect, read) timeouts for Cloud API calls; uploads get a longer read window
+HTTP_TIMEOUT = (5, 30)
+UPLOAD_TIMEOUT = (5, 60)
+# Cause list page watched for tomorrow's list
+TARGET_URL = "https://patnahighcourt.gov.in/causelist/auin/view/4079/0/CLIST"
+
+# Active scheduler window in minutes since midnight IST (8:00 PM - 11:30 PM)
+WINDOW_START_MINUTES = 20 * 60
+WINDOW_END_MINUTES = 23 * 60 + 30
+
+# JPEG quality for cause list screenshots (text stays crisp, files are far smaller than PNG)
+JPEG_QUALITY = 85
+
+# Cloud API media IDs expire after 30 days; stop reusing ours a little earlier
+MEDIA_ID_TTL = 25 * 24 * 3600
+
+# Transient statuses (rate limit / server errors) worth retrying
+RETRY_STATUSES = frozenset([429, 500, 502, 503, 504])
+
+# Header span holding the cause list date, when it contains only text
+HEADER_PATTERN = re.compile(r'id=["\']ctl00_MainContent_lblHeader["\'][^>]*>([^<]+)<')
+
+# Leading <?xml ... encoding=...?> declaration; lxml rejects it on an already-decoded str
+XML_DECLARATION_PATTERN = re.compile(r'^\ufeff?\s*<\?xml[^>]*\?>')
+
+# WhatsApp Web selector unions, built once instead of per send
+CHAT_INPUT_SELECTOR = 'div[aria-placeholder="Type a message"]'
+CAPTION_INPUT_SELECTOR = CHAT_INPUT_SELECTOR + '[data-lexical-editor="true"]'
+SEND_BUTTON_SELECTOR = '[data-icon="send"], [aria-label="Send"]'
+# Bubbles of messages we sent, used to confirm a send landed
+OUTGOING_MESSAGE_SELECTOR = 'div.message-out'
+# Attach (+) button; WhatsApp Web renames it often, so any of these will do
+ATTACH_BUTTON_SELECTOR = ", ".join([
+    'span[data-icon="plus"]',
+    'span[data-icon="attach-menu-plus"]',
+    '[data-icon="clip"]',
+    'button[aria-label="Attach"]',
+    '[aria-label="Attach"]',
+    'div[title="Attach"]',
+])
+# "Photos & videos" entry of the attach menu
+MEDIA_OPTION_SELECTOR = ", ".join([
+    '[data-icon="attach-image"]',
+    'li button[aria-label*="photo"]',
+    'li button[aria-label*="Photo"]',
+    'button:has-text("Photos")',
+    'span:has-text("Photos & videos")',
+    'li:has-text("Photos")',
+    '[aria-label*="Photos"]',
+    '[aria-label*="photo"]',
+])
+IMAGE_FILE_INPUT_SELECTOR = 'input[type="file"][accept*="image"]'
+# Elements that ONLY appear after login (not on the QR page):
+# - #side: The main sidebar container (definitive)
+# - #pane-side: The chat list container (definitive)
+# - Chat list search box (only visible after login)
+# NOTE: [data-icon="menu"] and [data-icon="chat"] are excluded - they appear on the QR page too!
+LOGGED_IN_SELECTOR = ", ".join([
+    '#side',
+    '#pane-side',
+    '[data-testid="chat-list-search"]',
+    'div[contenteditable="true"][data-tab="3"]',  # Search bar input
+    '[aria-label*="Search or start a new chat"]',  # Explicit search bar label
+])
+# First paint of WhatsApp Web: QR canvas or any chat chrome
+WHATSAPP_READY_SELECTOR = 'canvas, [data-icon="chat"], [data-icon="menu"], div[role="textbox"]'
+# Login/loading/QR visibility in one DOM pass (args: logged-in selector, loading selector)
+UI_STATE_SCRIPT = """([loggedIn, loading]) => {
+    const visible = sel => Array.from(document.querySelectorAll(sel)).some(el => {
+        const r = el.getBoundingClientRect();
+        return r.width > 0 && r.height > 0 && getComputedStyle(el).visibility !== 'hidden';
+    });
+    return {loggedIn: visible(loggedIn), loading: visible(loading), qr: visible('canvas')};
+}"""
+QR_RELOAD_SELECTOR = 'button:has-text("Click to reload QR"), [data-icon="refresh-large"], span[role="button"]:has-text("Reload")'
+
+# Elements likely to carry the list date, scanned before the whole page text
+DATE_CONTAINERS_XPATH = etree.XPath(
+    '//title | //h1 | //h2 | //h3 | //*[contains(@id, "Header") or contains(@id, "Date")]'
+)
+
+# Visible text nodes for the full-text date scan (compiled once; skips scripts/styles)
+TEXT_NODES_XPATH = etree.XPath('//text()[not(ancestor::script or ancestor::style)]')
+
+
+class PostSafeRetry(Retry):
+    """
+    urllib3 Retry that re-sends a POST on status only for 429. A 429 means the
+    request was rejected, whereas a Graph 5xx can arrive after the message was
+    already accepted, so resending it risks a duplicate.
+    """
+    
+    def is_retry(self, method, status_code, has_retry_after=False):
+        if method and method.upper() == "POST" and status_code != 429:
+            return False
+        return super().is_retry(method, status_code, has_retry_after)
+
+
+def create_http_session(pool_maxsize=16):
+    """
+    Build a requests.Session with keep-alive connection pooling and retries.
+    Reusing one session avoids a fresh TCP+TLS handshake on every API call.
+    
+    Args:
+        pool_maxsize: Connections kept alive per host; should be at least the
+            number of threads sharing the session, or extra sockets get discarded.
+    """
+    session = requests.Session()
+    retry = PostSafeRetry(
+        total=3,
+        connect=3,  # Nothing reached the server yet, always safe to retry
+        read=0,  # A read timeout may mean the message was delivered; don't resend
+        backoff_factor=0.5,
+        status_forcelist=RETRY_STATUSES,  # POSTs: 429 only, see PostSafeRetry
+        allowed_methods=frozenset(["HEAD", "GET", "POST"]),
+    )
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_maxsize, max_retries=retry)
+    session.mount("https://", adapter)
+    return session
+
+
+def failed_before_send(exc):
+    """
+    True when a requests exception provably happened before the request was
+    sent (connect timeout or refused/unresolvable connection), so resending
+    cannot duplicate a message. Any other failure has an unknown outcome.
+    """
+    if isinstance(exc, requests.exceptions.ConnectTimeout):
+        return True
+    if isinstance(exc, requests.exceptions.ConnectionError) and exc.args:
+        cause = exc.args[0]
+        # requests wraps urllib3's MaxRetryError, whose reason is the original error
+        return isinstance(cause, NewConnectionError) or isinstance(getattr(cause, "reason", None), NewConnectionError)
+    return False
+
+
+class RateLimiter:
+    """Thread-safe token bucket limiting outbound requests per second"""
+    
+    def __init__(self, rate, burst=None):
+        """
+        Args:
+            rate: Tokens added per second
+            burst: Maximum tokens held at once (defaults to rate)
+        """
+        self.rate = rate
+        self.capacity = burst or rate
+        self.tokens = self.capacity
+        self.last_refill = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def acquire(self):
+        """Block until a token is available, then consume it"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.last_refill) * self.rate)
+                self.last_refill = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait_time = (1 - self.tokens) / self.rate
+            time.sleep(wait_time)
+
 
 class ScreenshotManager:
     """Manages screenshot fetching operations"""
     
+    # Bump when the page_meta.json layout changes so stale files are ignored
+    PAGE_META_VERSION = 1
+    
     def __init__(self, target_url, cache_dir="cache"):
         """
         Initialize ScreenshotManager.
@@ -29,18 +225,202 @@ class ScreenshotManager:
         """
         self.target_url = target_url
         
-        # File path for screenshot
+        # File path for screenshot; JPEG unless SCREENSHOT_FORMAT=PNG asks for lossless
         self.cache_dir = cache_dir
         os.makedirs(self.cache_dir, exist_ok=True)
-        self.screenshot_path = os.path.join(self.cache_dir, "screenshot.png")
+        self.image_format = "PNG" if os.getenv("SCREENSHOT_FORMAT", "JPEG").upper() == "PNG" else "JPEG"
+        extension = "png" if self.image_format == "PNG" else "jpg"
+        self.screenshot_path = os.path.join(self.cache_dir, f"screenshot.{extension}")
+        # Validators (ETag / Last-Modified) and resolved date from the last page load
+        self.page_meta_path = os.path.join(self.cache_dir, "page_meta.json")
+        # Lightweight HTTP client for HEAD pre-checks (no browser needed)
+        self.session = create_http_session(pool_maxsize=1)
+        # Camoufox instance kept warm between checks (launched on first use)
+        self._camoufox = None
+        self._browser = None
+    
+    def close(self):
+        """Close the pooled HTTP session and any warm browser"""
+        self.release_browser()
+        self.session.close()
+    
+    def _acquire_browser(self):
+        """Return the shared Camoufox browser, launching it on first use"""
+        if self._browser is None:
+            # Imported on first launch so ticks that never take a screenshot skip the import
+            from camoufox.sync_api import Camoufox
+            logger.info("Launching Camoufox...")
+            self._camoufox = Camoufox(headless=True)
+            self._browser = self._camoufox.__enter__()
+        return self._browser
+    
+    def release_browser(self):
+        """Shut down the shared browser; the next check launches a fresh one"""
+        if self._camoufox is None:
+            return
+        try:
+            self._camoufox.__exit__(None, None, None)
+        except Exception as e:
+            logger.warning("Error while closing Camoufox: %s", e)
+        finally:
+            self._camoufox = None
+            self._browser = None
+    
+    def _load_page_meta(self):
+        """Load cached validators and extracted date, or {} if unavailable"""
+        try:
+            with open(self.page_meta_path, 'r') as f:
+                meta = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+        if not isinstance(meta, dict) or meta.get("version") != self.PAGE_META_VERSION:
+            return {}
+        return meta
+    
+    def _save_page_meta(self, response, extracted_date, today, from_header=False):
+        """
+        Persist the response validators alongside the date they produced.
+        from_header records whether the date came from the cause list header,
+        the only source the browserless check trusts.
+        """
+        headers = response.headers if response else {}
+        meta = {
+            "version": self.PAGE_META_VERSION,
+            "run_date": today.strftime('%Y-%m-%d'),
+            "etag": headers.get("etag"),
+            "last_modified": headers.get("last-modified"),
+            "cause_list_date": extracted_date.strftime('%Y-%m-%d'),
+            "from_header": from_header,
+        }
+        try:
+            with open(self.page_meta_path, 'w') as f:
+                json.dump(meta, f)
+        except OSError as e:
+            logger.warning("Could not save page metadata: %s", e)
+    
+    def _cached_future_date(self, meta, today):
+        """
+        Return the cached cause list date if it was resolved today and is
+        already in the future. Once tomorrow's list is up the answer cannot
+        change for the rest of the day, so re-parsing the page is wasted work.
+        """
+        if meta.get("run_date") != today.strftime('%Y-%m-%d') or not meta.get("cause_list_date"):
+            return None
+        cached_date = datetime.fromisoformat(meta["cause_list_date"])
+        return cached_date if cached_date.date() > today.date() else None
+    
+    def is_page_unchanged(self, today=None):
+        """
+        Cheap pre-check before launching a browser: HEAD the cause list page and
+        compare its validators with the last full load. Returns True only when
+        the page is known to be unchanged and its cached date is not in the
+        future (i.e. there is nothing new to send). Any doubt returns False.
+        """
+        today = today or datetime.now(IST)
+        meta = self._load_page_meta()
+        if not meta.get("cause_list_date") or not (meta.get("etag") or meta.get("last_modified")):
+            return False
+        
+        cached_date = datetime.fromisoformat(meta["cause_list_date"])
+        if cached_date.date() > today.date():
+            # A future list still has to be captured and sent
+            return False
+        
+        try:
+            response = self.session.head(self.target_url, timeout=HTTP_TIMEOUT, allow_redirects=True)
+        except requests.exceptions.RequestException as e:
+            logger.warning("HEAD pre-check failed, loading page anyway: %s", e)
+            return False
+        
+        if response.status_code != 200:
+            return False
+        
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if meta.get("etag") and etag:
+            return etag == meta["etag"]
+        if meta.get("last_modified") and last_modified:
+            return last_modified == meta["last_modified"]
+        return False
+    
+    def _navigate_conditionally(self, page, meta):
+        """
+        Navigate to the target URL, echoing cached validators so the server
+        can answer 304 Not Modified without sending the page body.
+        Returns the navigation response.
+        """
+        conditional_headers = {}
+        if meta.get("etag"):
+            conditional_headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            conditional_headers["If-Modified-Since"] = meta["last_modified"]
+        
+        if not conditional_headers:
+            return page.goto(self.target_url)
+        
+        # Only the document request gets the validators, not its subresources
+        def _add_validators(route):
+            route.continue_(headers={**route.request.headers, **conditional_headers})
+        
+        page.route(self.target_url, _add_validators)
+        try:
+            return page.goto(self.target_url)
+        finally:
+            page.unroute(self.target_url, _add_validators)
     
-    def process_webpage(self, browser=None):
+    def fetch_date_without_browser(self, today=None):
+        """
+        Resolve the cause list date with a plain conditional GET: the header is
+        server-rendered, so no browser is needed just to read it.
+        Returns None on any doubt (blocked, error, no header date) so the caller
+        can fall back to the browser. Only the header is trusted here: a stray
+        date elsewhere in the raw HTML must never stand in for the list date.
+        """
+        today = today or datetime.now(IST)
+        meta = self._load_page_meta()
+        headers = {}
+        # A 304 replays the cached date, so only revalidate a header-sourced one
+        if meta.get("cause_list_date") and meta.get("from_header"):
+            if meta.get("etag"):
+                headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                headers["If-Modified-Since"] = meta["last_modified"]
+        
+        try:
+            response = self.session.get(self.target_url, headers=headers, timeout=HTTP_TIMEOUT)
+        except requests.exceptions.RequestException as e:
+            logger.debug("Browserless date check failed: %s", e)
+            return None
+        
+        if response.status_code == 304:
+            return datetime.fromisoformat(meta["cause_list_date"])
+        if response.status_code != 200:
+            logger.debug("Browserless date check got HTTP %s", response.status_code)
+            return None
+        
+        extracted_date = self._extract_date_from_page_content(response.text, today, header_only=True)
+        if extracted_date:
+            self._save_page_meta(response, extracted_date, today, from_header=True)
+        return extracted_date
+    
+    def process_webpage(self, browser=None, today=None):
         """
         Unified method to check date and capture screenshot.
+        The screenshot is only taken when the page holds a list dated after today;
+        otherwise the date is returned with no screenshot path.
         Args:
             browser: Optional existing Camoufox browser instance.
+            today: Current IST datetime for this tick (defaults to now).
         """
-        print(f"[INFO] Launching Camoufox to check date and capture screenshot...")
+        today = today or datetime.now(IST)
+        
+        # Most checks only learn that the list is still today's; answer those without a browser
+        quick_date = self.fetch_date_without_browser(today)
+        if quick_date and quick_date.date() <= today.date():
+            logger.info("Cause list date via HTTP: %s (no browser needed)", quick_date.strftime('%d-%m-%Y'))
+            return quick_date, None
+        
+        logger.info("Using Camoufox to check date and capture screenshot...")
         
         # Internal helper to run logic with a given browser
         def _run_with_browser(browser_instance):
@@ -50,15 +430,15 @@ class ScreenshotManager:
             if quality_setting == "LOW":
                 viewport = {"width": 800, "height": 600}
                 scale_factor = 1
-                print("[INFO] Using LOW quality (800x600, 1x)")
+                logger.info("Using LOW quality (800x600, 1x)")
             elif quality_setting == "MEDIUM":
                 viewport = {"width": 1280, "height": 720}
                 scale_factor = 1
-                print("[INFO] Using MEDIUM quality (1280x720, 1x)")
+                logger.info("Using MEDIUM quality (1280x720, 1x)")
             else: # Default to HIGH
                 viewport = {"width": 1920, "height": 1080}
                 scale_factor = 2
-                print(f"[INFO] Using {quality_setting} quality (1920x1080, 2x)")
+                logger.info("Using %s quality (1920x1080, 2x)", quality_setting)
 
             page = browser_instance.new_page(
                 viewport=viewport,
@@ -66,29 +446,65 @@ class ScreenshotManager:
             )
             page.set_default_timeout(60000)
             
-            print(f"[INFO] Navigating to: {self.target_url}")
-            page.goto(self.target_url)
+            logger.info("Navigating to: %s", self.target_url)
+            meta = self._load_page_meta()
+            response = self._navigate_conditionally(page, meta)
+            
+            if response and response.status == 304 and meta.get("cause_list_date"):
+                cached_date = datetime.fromisoformat(meta["cause_list_date"])
+                if cached_date.date() <= today.date():
+                    # Unchanged page with a stale date: nothing to screenshot
+                    logger.info("Page not modified since last check (date %s).", cached_date.strftime('%d-%m-%Y'))
+                    page.close()
+                    return cached_date, None
+                # A new list is cached but we need fresh pixels; load the full page
+                logger.info("Page not modified, reloading body for screenshot...")
+                response = page.goto(self.target_url)
             
             # Wait for content to settle
+            header_found = False
             try:
                 page.wait_for_selector('#ctl00_MainContent_lblHeader', timeout=30000)
+                header_found = True
             except:
-                print("[WARN] lblHeader not found quickly, proceeding anyway...")
+                logger.warning("lblHeader not found quickly, proceeding anyway...")
             
             time.sleep(5) 
-            html_content = page.content()
-            extracted_date = self._extract_date_from_page_content(html_content)
+            cached_date = self._cached_future_date(meta, today) if header_found else None
+            from_header = False
+            if cached_date:
+                logger.info("Reusing cause list date resolved earlier today: %s", cached_date.strftime('%d-%m-%Y'))
+                extracted_date = cached_date
+                from_header = bool(meta.get("from_header"))
+            else:
+                # The rendered header text is a few bytes; serialize the whole DOM only if it misses
+                extracted_date = self._extract_date_from_header(page) if header_found else None
+                from_header = extracted_date is not None
+                if not extracted_date:
+                    extracted_date = self._extract_date_from_page_content(page.content(), today)
             
             if not extracted_date:
-                 print("[WARN] Could not extract date from webpage.")
+                 logger.warning("Could not extract date from webpage.")
                  page.close()
                  return None, None
             
+            self._save_page_meta(response, extracted_date, today, from_header)
+            
+            # Most checks find today's (old) list; don't render pixels nobody will receive
+            if extracted_date.date() <= today.date():
+                page.close()
+                return extracted_date, None
+            
             # --- 2. Take Screenshot ---
             # We take it now while the browser is open. 
-            page.screenshot(path=self.screenshot_path, full_page=True)
+            if self.image_format == "JPEG":
+                page.screenshot(path=self.screenshot_path, full_page=True, type="jpeg", quality=JPEG_QUALITY)
+            else:
+                page.screenshot(path=self.screenshot_path, full_page=True)
+            
             file_size = os.path.getsize(self.screenshot_path)
-            print(f"[OK] Screenshot captured: {self.screenshot_path} ({file_size} bytes)")
+            logger.log(OK, "Screenshot captured: %s (%s bytes)", self.screenshot_path, file_size)
+            self._optimize_screenshot(self.screenshot_path)
             
             page.close()
             return extracted_date, self.screenshot_path
@@ -97,55 +513,216 @@ class ScreenshotManager:
             if browser:
                 return _run_with_browser(browser)
             else:
-                with Camoufox(headless=True) as new_browser:
-                    return _run_with_browser(new_browser)
+                # Reuse the warm browser: later ticks skip the multi-second launch
+                return _run_with_browser(self._acquire_browser())
 
         except Exception as e:
-            print(f"[ERROR] Browser automation failed: {e}")
+            logger.error("Browser automation failed: %s", e)
+            if not browser:
+                # It may be wedged or have leaked pages; relaunch on the next check
+                self.release_browser()
             return None, None
 
-    def _extract_date_from_page_content(self, html_content):
-        """Helper to parse date from HTML content (using BeautifulSoup)"""
+    def _optimize_screenshot(self, image_path):
+        """
+        Shrink the screenshot before upload: cap its width (WhatsApp downsizes
+        larger images anyway) and re-encode it in the configured format.
+        Keeps the original file if anything goes wrong.
+        """
+        try:
+            max_width = int(os.getenv("SCREENSHOT_MAX_WIDTH", "2560"))
+        except ValueError:
+            logger.warning("Invalid SCREENSHOT_MAX_WIDTH %r, using 2560", os.getenv("SCREENSHOT_MAX_WIDTH"))
+            max_width = 2560
+        original_size = os.path.getsize(image_path)
+        optimized_path = image_path + ".tmp"
+        
         try:
-            soup = BeautifulSoup(html_content, 'html.parser')
+            # Pillow is only needed when a screenshot was actually taken
+            from PIL import Image
+
+            with Image.open(image_path) as img:
+                img.load()
+                resized = img.width > max_width
+                if resized:
+                    new_height = round(img.height * max_width / img.width)
+                    img = img.resize((max_width, new_height), Image.LANCZOS)
+                    logger.info("Downscaled screenshot to %sx%s", max_width, new_height)
+                elif self.image_format == "JPEG":
+                    # Re-encoding an unscaled JPEG only adds generation loss
+                    return
+                if self.image_format == "JPEG":
+                    img.save(optimized_path, "JPEG", quality=JPEG_QUALITY, optimize=True)
+                else:
+                    img.save(optimized_path, "PNG", optimize=True)
+            
+            # Re-encoding an already tight PNG can grow it; keep whichever is smaller
+            if resized or os.path.getsize(optimized_path) < original_size:
+                os.replace(optimized_path, image_path)
+            else:
+                os.remove(optimized_path)
+        except Exception as e:
+            logger.warning("Screenshot optimization skipped: %s", e)
+            with suppress(FileNotFoundError):
+                os.remove(optimized_path)
+            return
+        
+        logger.info("Optimized screenshot: %s -> %s bytes", original_size, os.path.getsize(image_path))
+
+    def _extract_date_from_header(self, page):
+        """Read the date straight from the rendered header element, or None"""
+        try:
+            header_text = page.locator('#ctl00_MainContent_lblHeader').first.inner_text(timeout=2000)
+        except Exception as e:
+            logger.debug("Header text unavailable: %s", e)
+            return None
+        
+        date_match = DATE_PATTERN.search(header_text)
+        parsed = self._parse_date(date_match.group(1)) if date_match else None
+        if parsed:
+            logger.info("Found header element: %s", header_text.strip())
+        return parsed
+
+    def _extract_date_from_page_content(self, html_content, today=None, header_only=False):
+        """
+        Helper to parse date from HTML content (using lxml).
+        With header_only, give up once the header lookups miss instead of
+        falling back to the looser heading and full-text scans.
+        """
+        try:
+            # No date-like substring anywhere: neither strategy can succeed, skip the parse
+            if not DATE_PATTERN.search(html_content):
+                return None
+            
+            # Fast path: plain-text header span, matched without building a tree
+            header_match = HEADER_PATTERN.search(html_content)
+            if header_match:
+                date_match = DATE_PATTERN.search(unescape(header_match.group(1)))
+                if date_match:
+                    parsed = self._parse_date(date_match.group(1))
+                    if parsed:
+                        logger.info("Found header element: %s", unescape(header_match.group(1)).strip())
+                        return parsed
+            
+            # lxml builds the tree in C; only the nodes we query become Python objects
+            tree = lxml_html.fromstring(XML_DECLARATION_PATTERN.sub('', html_content, count=1))
             
             # Strategy 1: Specific ID
-            header_element = soup.find(id='ctl00_MainContent_lblHeader')
-            if header_element:
-                header_text = header_element.get_text(strip=True)
-                print(f"[INFO] Found header element: {header_text}")
+            header_element = tree.get_element_by_id('ctl00_MainContent_lblHeader', None)
+            if header_element is not None:
+                header_text = header_element.text_content().strip()
+                logger.info("Found header element: %s", header_text)
                 
-                date_match = re.search(r'(\d{1,2}[-/]\d{1,2}[-/]\d{4})', header_text)
+                date_match = DATE_PATTERN.search(header_text)
                 if date_match:
-                    try:
-                        return datetime.strptime(date_match.group(1), '%d-%m-%Y')
-                    except ValueError:
-                        pass
+                    parsed = self._parse_date(date_match.group(1))
+                    if parsed:
+                        return parsed
             
-            # Strategy 2: Regex in full text
-            text_content = soup.get_text()
-            matches = re.findall(r'\b(\d{1,2}[-/]\d{1,2}[-/]\d{4})\b', text_content)
+            if header_only:
+                return None
             
-            for match in matches:
-                try:
-                    d = datetime.strptime(match, '%d-%m-%Y')
-                    # Sanity check: is date within reasonable range? (+/- 60 days)
-                    if abs((d - datetime.now()).days) < 60:
-                        print(f"[INFO] Extracted date from text: {match}")
-                        return d
-                except ValueError:
-                    continue
+            # Candidates are naive dates; compare against today in IST
+            now = (today or datetime.now(IST)).replace(tzinfo=None)
             
-            return None
+            # Strategy 2: Regex in titles, headings and header/date-like ids
+            for node in DATE_CONTAINERS_XPATH(tree):
+                d = self._find_recent_date(node.text_content(), now)
+                if d:
+                    return d
+            
+            # Strategy 3: Regex in full text
+            # Separator keeps adjacent cells from fusing into one digit run
+            return self._find_recent_date(' '.join(TEXT_NODES_XPATH(tree)), now)
             
         except Exception as e:
-            print(f"[WARN] Date parsing failed: {e}")
+            logger.warning("Date parsing failed: %s", e)
+            return None
+
+    def _find_recent_date(self, text, now):
+        """Return the first date in text within +/- 60 days of now, or None"""
+        # Lazily scanned: the first plausible date ends the search
+        for date_match in DATE_PATTERN.finditer(text):
+            match = date_match.group(1)
+            d = self._parse_date(match)
+            # Sanity check: is date within reasonable range? (+/- 60 days)
+            if d and abs((d - now).days) < 60:
+                logger.info("Extracted date from text: %s", match)
+                return d
+        return None
+
+    @staticmethod
+    @lru_cache(maxsize=128)
+    def _parse_date(date_str):
+        """Parse a DD-MM-YYYY or DD/MM/YYYY string, returning None if invalid"""
+        # DATE_PATTERN already fixed the layout, so plain int() beats strptime,
+        # which re-parses its format string on every call
+        sep = '-' if '-' in date_str else '/'
+        try:
+            day, month, year = date_str.split(sep)
+            return datetime(int(year), int(month), int(day))
+        except ValueError:
             return None
 
 
 
-import threading
-from http.server import HTTPServer, SimpleHTTPRequestHandler
+# QR dashboard page, encoded once; the page swaps the image itself, so it never changes
+QR_DASHBOARD_HTML = """
+<!DOCTYPE html>
+<html>
+<head>
+    <title>WhatsApp Web Login</title>
+    <style>
+        body { font-family: sans-serif; text-align: center; padding: 20px; background: #f0f2f5; margin: 0; }
+        .card { background: white; padding: 20px; border-radius: 12px; box-shadow: 0 8px 16px rgba(0,0,0,0.1); display: inline-block; max-width: 400px; margin-top: 50px; }
+        h1 { color: #128C7E; font-size: 24px; margin-bottom: 10px; }
+        .status { display: inline-block; padding: 5px 15px; background: #e7f3ff; color: #007bff; border-radius: 20px; font-weight: bold; margin-bottom: 20px; }
+        .qr-container { border: 2px solid #25d366; padding: 10px; border-radius: 10px; background: white; }
+        img { display: block; width: 100%; height: auto; border-radius: 5px; }
+        .steps { text-align: left; margin-top: 20px; color: #555; font-size: 14px; }
+        .steps ol { padding-left: 20px; }
+    </style>
+</head>
+<body>
+    <div class="card">
+        <h1>WhatsApp Login</h1>
+        <div class="status">Waiting for Scan...</div>
+        <div class="qr-container">
+            <img id="qr" src="/whatsapp_qr.png" alt="QR Code Loading..." />
+        </div>
+        <div class="steps">
+            <strong>Steps:</strong>
+            <ol>
+                <li>Open <b>WhatsApp</b> on your phone</li>
+                <li>Tap <b>Menu</b> or <b>Settings</b></li>
+                <li>Select <b>Linked Devices</b></li>
+                <li>Tap <b>Link a Device</b> and scan this code</li>
+            </ol>
+        </div>
+    </div>
+    <script>
+        // Refresh only the QR image; the page itself never reloads
+        setInterval(function () {
+            document.getElementById('qr').src = '/whatsapp_qr.png?t=' + Date.now();
+        }, 2000);
+    </script>
+</body>
+</html>
+""".encode()
+
+# QR PNG bytes keyed by path, as (mtime_ns, size, data); refreshed when the file changes
+_QR_CACHE = {}
+
+def _read_qr_image(qr_path):
+    """Return (etag, data) for the QR PNG, re-reading the file only after it changes"""
+    st = os.stat(qr_path)
+    cached = _QR_CACHE.get(qr_path)
+    if cached is None or cached[:2] != (st.st_mtime_ns, st.st_size):
+        with open(qr_path, 'rb') as f:
+            data = f.read()
+        cached = (st.st_mtime_ns, st.st_size, data)
+        _QR_CACHE[qr_path] = cached
+    return f'"{cached[0]:x}-{cached[1]:x}"', cached[2]
 
 class QRHandler(SimpleHTTPRequestHandler):
     """Custom handler to serve the QR dashboard"""
@@ -153,45 +730,9 @@ class QRHandler(SimpleHTTPRequestHandler):
         if self.path == '/':
             self.send_response(200)
             self.send_header('Content-type', 'text/html')
+            self.send_header('Content-Length', str(len(QR_DASHBOARD_HTML)))
             self.end_headers()
-            html = """
-            <!DOCTYPE html>
-            <html>
-            <head>
-                <title>WhatsApp Web Login</title>
-                <meta http-equiv="refresh" content="2">
-                <style>
-                    body { font-family: sans-serif; text-align: center; padding: 20px; background: #f0f2f5; margin: 0; }
-                    .card { background: white; padding: 20px; border-radius: 12px; box-shadow: 0 8px 16px rgba(0,0,0,0.1); display: inline-block; max-width: 400px; margin-top: 50px; }
-                    h1 { color: #128C7E; font-size: 24px; margin-bottom: 10px; }
-                    .status { display: inline-block; padding: 5px 15px; background: #e7f3ff; color: #007bff; border-radius: 20px; font-weight: bold; margin-bottom: 20px; }
-                    .qr-container { border: 2px solid #25d366; padding: 10px; border-radius: 10px; background: white; }
-                    img { display: block; width: 100%; height: auto; border-radius: 5px; }
-                    .steps { text-align: left; margin-top: 20px; color: #555; font-size: 14px; }
-                    .steps ol { padding-left: 20px; }
-                </style>
-            </head>
-            <body>
-                <div class="card">
-                    <h1>WhatsApp Login</h1>
-                    <div class="status">Waiting for Scan...</div>
-                    <div class="qr-container">
-                        <img src="/whatsapp_qr.png?t=""" + str(int(time.time())) + """" alt="QR Code Loading..." />
-                    </div>
-                    <div class="steps">
-                        <strong>Steps:</strong>
-                        <ol>
-                            <li>Open <b>WhatsApp</b> on your phone</li>
-                            <li>Tap <b>Menu</b> or <b>Settings</b></li>
-                            <li>Select <b>Linked Devices</b></li>
-                            <li>Tap <b>Link a Device</b> and scan this code</li>
-                        </ol>
-                    </div>
-                </div>
-            </body>
-            </html>
-            """
-            self.wfile.write(html.encode())
+            self.wfile.write(QR_DASHBOARD_HTML)
         elif self.path.startswith('/whatsapp_qr.png'):
             # Serve the specific file from the cache directory
             # We map this request to the actual file path dynamically
@@ -199,11 +740,20 @@ class QRHandler(SimpleHTTPRequestHandler):
             qr_path = os.path.join(cache_dir, 'whatsapp_qr.png')
             
             try:
-                with open(qr_path, 'rb') as f:
-                    self.send_response(200)
-                    self.send_header('Content-type', 'image/png')
+                # Polls between QR changes are served from memory
+                etag, data = _read_qr_image(qr_path)
+                if self.headers.get('If-None-Match') == etag:
+                    self.send_response(304)
+                    self.send_header('ETag', etag)
                     self.end_headers()
-                    self.wfile.write(f.read())
+                    return
+                self.send_response(200)
+                self.send_header('Content-type', 'image/png')
+                self.send_header('Content-Length', str(len(data)))
+                self.send_header('ETag', etag)
+                self.send_header('Cache-Control', 'no-cache')
+                self.end_headers()
+                self.wfile.write(data)
             except FileNotFoundError:
                 self.send_error(404, f"QR Code not found yet in {qr_path}")
         else:
@@ -221,27 +771,80 @@ class WhatsAppWebClient:
         os.makedirs(self.cache_dir, exist_ok=True)
         self.session_path = os.path.join(self.cache_dir, "whatsapp_session.json")
         self.qr_path = os.path.join(self.cache_dir, "whatsapp_qr.png")
+        self._qr_digest = None
+        # Debug frames cost an encode + disk write each, so they are opt-in
+        self.debug_screenshots = os.getenv("DEBUG_SCREENSHOTS", "0").lower() in ("1", "true", "yes")
+        self._debug_writer = None
         
     def _start_qr_server(self):
         """Starts a background HTTP server to serve the QR code"""
         try:
-            server = HTTPServer(('0.0.0.0', 3000), QRHandler)
+            # One thread per request, so a slow client can't stall other dashboard polls
+            server = ThreadingHTTPServer(('0.0.0.0', 3000), QRHandler)
             # Inject cache directory so the handler knows where to look
             server.cache_dir = self.cache_dir
             
             thread = threading.Thread(target=server.serve_forever)
             thread.daemon = True
             thread.start()
-            print("[INFO] Live QR Dashboard running at: http://localhost:3000")
+            logger.info("Live QR Dashboard running at: http://localhost:3000")
             return server
         except Exception as e:
-            print(f"[WARN] Failed to start QR server: {e}")
+            logger.warning("Failed to start QR server: %s", e)
             return None
 
+    def _capture_qr(self, page):
+        """
+        Screenshot just the QR code (its data-ref container keeps the white quiet
+        zone scanners need), falling back to the full page if it can't be found.
+        """
+        for selector in ('div[data-ref]', 'canvas'):
+            try:
+                target = page.locator(selector).first
+                if target.is_visible():
+                    return target.screenshot(type="png")
+            except Exception as e:
+                logger.debug("QR element capture via %s failed: %s", selector, e)
+        return page.screenshot(full_page=True)
+
+    def _write_qr_image(self, data):
+        """
+        Publish a QR capture for the dashboard, skipping identical frames so the
+        file (and the dashboard's ETag) only changes when the pixels do.
+        """
+        digest = hashlib.blake2b(data, digest_size=16).digest()
+        if digest == self._qr_digest:
+            return
+        # Write-then-rename: the dashboard never serves a half-written PNG
+        tmp_path = self.qr_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, self.qr_path)
+        self._qr_digest = digest
+
     def _save_debug_screenshot(self, page, name):
-        """Helper to save debug screenshots with timestamp"""
-        # DISABLED for production
-        pass
+        """Helper to save debug screenshots with timestamp (only when DEBUG_SCREENSHOTS is set)"""
+        if not self.debug_screenshots:
+            return
+        try:
+            # Viewport-only JPEG keeps the capture cheap; the disk write happens off the send flow
+            data = page.screenshot(type="jpeg", quality=60, full_page=False)
+        except Exception as e:
+            logger.debug("Debug screenshot '%s' failed: %s", name, e)
+            return
+        if self._debug_writer is None:
+            self._debug_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="debug-shot")
+        path = os.path.join(self.cache_dir, f"{name}_{datetime.now(IST).strftime('%H%M%S')}.jpg")
+        self._debug_writer.submit(self._write_debug_file, path, data)
+
+    @staticmethod
+    def _write_debug_file(path, data):
+        """Write a captured debug frame to disk"""
+        try:
+            with open(path, "wb") as f:
+                f.write(data)
+        except OSError as e:
+            logger.debug("Could not write debug screenshot %s: %s", path, e)
 
     def _get_persistent_context(self, playwright):
         """
@@ -252,7 +855,7 @@ class WhatsAppWebClient:
         self.profile_dir = os.path.join(self.cache_dir, "whatsapp_profile")
         os.makedirs(self.profile_dir, exist_ok=True)
         
-        print(f"[INFO] Using persistent profile: {self.profile_dir}")
+        logger.info("Using persistent profile: %s", self.profile_dir)
         
         # Browser Arguments (Optimized for WhatsApp Web)
         browser_args = [
@@ -289,7 +892,7 @@ class WhatsAppWebClient:
             '--use-mock-keychain',
             '--window-size=1280,720',
             '--disable-blink-features=AutomationControlled',
-            '--disk-cache-size=1073741824', 
+            '--disk-cache-size=67108864',  # 64 MB is plenty for the few URLs WhatsApp Web loads
         ]
         
         native_user_agent = 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/143.0.0.0 Safari/537.36'
@@ -321,19 +924,27 @@ class WhatsAppWebClient:
     def start(self):
         """Start the session"""
         from playwright.sync_api import sync_playwright
-        print("[INFO] Starting persistent session...")
+        logger.info("Starting persistent session...")
         self._playwright = sync_playwright().start()
         self._context = self._get_persistent_context(self._playwright)
         return self._context
 
     def stop(self):
         """Stop the session"""
-        print("[INFO] Stopping session...")
-        if hasattr(self, '_context'):
-            self._context.close()
-        if hasattr(self, '_playwright'):
-            self._playwright.stop()
-        print("[INFO] Session stopped.")
+        logger.info("Stopping session...")
+        if self._debug_writer is not None:
+            # Let queued debug frames reach disk before the process can exit
+            self._debug_writer.shutdown(wait=True)
+            self._debug_writer = None
+        context = getattr(self, '_context', None)
+        playwright = getattr(self, '_playwright', None)
+        self._context = self._playwright = None
+        if context is not None:
+            with suppress(Exception):
+                context.close()
+        if playwright is not None:
+            playwright.stop()
+        logger.info("Session stopped.")
 
     def _get_context(self, browser):
         """Create a browser context, loading session if available [LEGACY]"""
@@ -347,188 +958,147 @@ class WhatsAppWebClient:
         Navigates to root web.whatsapp.com and handles QR code if needed.
         Solved the 'unable to scan' problem by ensuring a clean entry point.
         """
-        print("[INFO] Verifying authentication status...")
+        logger.info("Verifying authentication status...")
         if "web.whatsapp.com" not in page.url:
             page.goto("https://web.whatsapp.com/")
             
         try:
             # Wait for either QR code (canvas) or Main Chat List (pane-side)
-            page.wait_for_selector('canvas, [data-icon="chat"], [data-icon="menu"], div[role="textbox"]', timeout=60000)
+            page.wait_for_selector(WHATSAPP_READY_SELECTOR, timeout=60000)
             time.sleep(2)
         except:
              pass
         # 0. Wait for page load (Critical for Docker/Headless)
         try:
-             print("[INFO] Waiting for WhatsApp to load (QR or Chat list)...")
+             logger.info("Waiting for WhatsApp to load (QR or Chat list)...")
              # Wait for either #side (Logged in) OR canvas (QR Code) OR [data-testid="qrcode"] (QR container)
              page.wait_for_selector('#side, canvas, [data-testid="qrcode"]', timeout=60000)
         except Exception as e:
-             print(f"[WARN] Initial load timeout: {e}")
+             logger.warning("Initial load timeout: %s", e)
 
-        # 1. Check if we are already logged in (Priority)
-        # Stricter selectors that ONLY appear after login (not on QR page):
-        # - #side: The main sidebar container (definitive)
-        # - #pane-side: The chat list container (definitive)
-        # - Chat list search box (only visible after login)
-        # NOTE: [data-icon="menu"] and [data-icon="chat"] removed - they appear on QR page too!
-        login_indicators = [
-            '#side', 
-            '#pane-side',
-            '[data-testid="chat-list-search"]',
-            'div[contenteditable="true"][data-tab="3"]', # Search bar input
-            '[aria-label*="Search or start a new chat"]' # Explicit search bar label
-        ]
+        # One snapshot answers the logged-in / loading / QR probes below
+        try:
+            state = page.evaluate(UI_STATE_SCRIPT, [LOGGED_IN_SELECTOR, 'progress, [data-testid="progress-bar"]'])
+        except Exception as e:
+            logger.warning("Could not read WhatsApp UI state: %s", e)
+            state = {"loggedIn": False, "loading": False, "qr": False}
         
-        # Check any of them
-        for selector in login_indicators:
-            if page.locator(selector).first.is_visible():
-                print(f"[INFO] Already logged in (detected {selector}).")
-                return True
+        # 1. Check if we are already logged in (Priority)
+        if state["loggedIn"]:
+            logger.info("Already logged in.")
+            return True
         
         # Check for loading screen
-        if page.locator('progress').is_visible() or page.locator('[data-testid="progress-bar"]').is_visible():
-            print("[INFO] WhatsApp is loading... waiting.")
+        if state["loading"]:
+            logger.info("WhatsApp is loading... waiting.")
             try:
                 # Wait for SIDEBAR which is the best indicator
                 page.wait_for_selector('#side', timeout=45000)
-                print("[INFO] Loading complete. Logged in.")
+                logger.info("Loading complete. Logged in.")
                 return True
             except:
-                print("[WARN] Timed out waiting for load.")
+                logger.warning("Timed out waiting for load.")
+                # The snapshot predates the wait; the QR may have rendered since
+                state["qr"] = page.locator('canvas').is_visible()
 
         # 2. Check for QR Code (Secondary)
-        if page.locator('canvas').is_visible():
-            print("[WARN] QR Code detected. Session not authenticated.")
-            print("[WARN] Not logged in. Starting Live QR Dashboard...")
+        if state["qr"]:
+            logger.warning("QR Code detected. Session not authenticated.")
+            logger.warning("Not logged in. Starting Live QR Dashboard...")
             self._save_debug_screenshot(page, "auth_qr_needed")
             self._start_qr_server()
-            print(f"[ACTION REQUIRED] Open http://localhost:3000 to scan the QR code.")
+            logger.warning("ACTION REQUIRED: Open http://localhost:3000 to scan the QR code.")
+            
+            # Re-capture the dashboard PNG only when WhatsApp swaps the QR code
+            qr_state = {"dirty": True}
+            try:
+                page.expose_function("onQRChanged", lambda: qr_state.update(dirty=True))
+                page.evaluate("""() => {
+                    const target = document.querySelector('[data-ref]') || document.body;
+                    new MutationObserver(() => window.onQRChanged())
+                        .observe(target, {attributes: true, childList: true, subtree: true});
+                }""")
+                observing = True
+            except Exception as e:
+                logger.debug("QR change observer unavailable, capturing every poll: %s", e)
+                observing = False
+            
+            reload_button = page.locator(QR_RELOAD_SELECTOR).locator("visible=true").first
             
             max_retries = 60 # 2 minutes for QR scan
             for i in range(max_retries):
-                # Check for Login Success inside loop
-                for selector in login_indicators:
-                    if page.locator(selector).first.is_visible():
-                        print(f"[INFO] Login detected! (found {selector})")
-                        time.sleep(5)
-                        self._save_debug_screenshot(page, "login_success")
-                        return True
+                # Block on the login indicators for up to one poll interval: returns the
+                # moment the scan completes, and lets Playwright deliver onQRChanged callbacks
+                try:
+                    page.wait_for_selector(LOGGED_IN_SELECTOR, state="visible", timeout=2000)
+                    logger.info("Login detected!")
+                    time.sleep(5)
+                    self._save_debug_screenshot(page, "login_success")
+                    return True
+                except Exception:
+                    pass
                 
                 # Check if QR expired or needs reload
                 if page.locator('canvas').is_visible():
                     # Reload logic
-                    reload_selectors = ['button:has-text("Click to reload QR")', '[data-icon="refresh-large"]', 'span[role="button"]:has-text("Reload")']
-                    for sel in reload_selectors:
-                        try:
-                            btn = page.locator(sel).first
-                            if btn.is_visible(timeout=1000):
-                                print("[INFO] QR expired. Clicking reload button...")
-                                btn.click()
-                                time.sleep(2)
-                                break
-                        except: pass
-
                     try:
-                        # Full page screenshot as requested
-                        page.screenshot(path=self.qr_path, full_page=True)
-                        print(".", end="", flush=True)
-                    except Exception as e:
-                        print(f"[WARN] Failed to capture QR: {e}")
+                        if reload_button.is_visible():
+                            logger.info("QR expired. Clicking reload button...")
+                            reload_button.click()
+                            time.sleep(2)
+                            qr_state["dirty"] = True
+                    except: pass
+
+                    if qr_state["dirty"] or not observing:
+                        try:
+                            self._write_qr_image(self._capture_qr(page))
+                            qr_state["dirty"] = False
+                            logger.debug("QR frame captured")
+                        except Exception as e:
+                            logger.warning("Failed to capture QR: %s", e)
                 
-                time.sleep(2)
                 if i % 10 == 0:
-                     print(f"[INFO] Waiting for scan... ({i}/{max_retries})")
+                     logger.info("Waiting for scan... (%s/%s)", i, max_retries)
             
-            print("[ERROR] QR Scan timed out.")
+            logger.error("QR Scan timed out.")
             return False
 
         # 3. Fallback: Unknown State
         # Maybe it's logged in but selectors failed? Take a closer look.
-        print("[WARN] Unknown state. Checking fallback selectors...")
+        logger.warning("Unknown state. Checking fallback selectors...")
         if page.locator('#side').is_visible():
-             print("[INFO] Logged in (fallback check passed).")
+             logger.info("Logged in (fallback check passed).")
              return True
 
-        print("[ERROR] Unknown state. Neither logged in nor QR code found.")
+        logger.error("Unknown state. Neither logged in nor QR code found.")
         self._save_debug_screenshot(page, "auth_failed_unknown_state")
         return False
 
-    def _paste_file(self, page, file_path):
+    def _is_chat_open(self, page, timeout=5000):
+        """Return True if a chat input box is rendered on the page"""
+        try:
+            page.wait_for_selector(CHAT_INPUT_SELECTOR, timeout=timeout)
+            return True
+        except:
+            return False
+
+    def _attach_image_directly(self, page, image_path):
         """
-        Simulates pasting OR dropping a file into the chat.
-        Robust fallback that tries both Paste and Drag-and-Drop events.
+        Set the image on WhatsApp's hidden file input, skipping the Attach menu.
+        Returns False only when the input is unavailable, so the caller can fall
+        back to the menu without risking a second attachment.
         """
-        print("[INFO] Simulating direct file injection (Paste/Drop)...")
-        
-        with open(file_path, "rb") as f:
-            encoded_file = base64.b64encode(f.read()).decode('utf-8')
-            
-        filename = os.path.basename(file_path)
-        mime = "image/png"
-        
-        js_script = """(args) => {
-            const [data, filename, mime] = args;
-            
-            // 1. Convert base64 to File Object
-            const byteCharacters = atob(data);
-            const byteArrays = [];
-            for (let offset = 0; offset < byteCharacters.length; offset += 512) {
-                const slice = byteCharacters.slice(offset, offset + 512);
-                const byteNumbers = new Array(slice.length);
-                for (let i = 0; i < slice.length; i++) {
-                    byteNumbers[i] = slice.charCodeAt(i);
-                }
-                const byteArray = new Uint8Array(byteNumbers);
-                byteArrays.push(byteArray);
-            }
-            const blob = new Blob(byteArrays, {type: mime});
-            const file = new File([blob], filename, { type: mime });
-            
-            // 2. Prepare DataTransfer
-            const dt = new DataTransfer();
-            dt.items.add(file);
-            
-            // 3. Find Target (Chat Input)
-            const getTarget = () => {
-                const selectors = [
-                    'div[aria-placeholder="Type a message"]',
-                    'div[data-tab="10"]', 
-                    'footer div[contenteditable="true"]',
-                    'div[role="textbox"][contenteditable="true"]'
-                ];
-                
-                for (let s of selectors) {
-                    const el = document.querySelector(s);
-                    if (el) return el;
-                }
-                return document.querySelector('div[contenteditable="true"]') || document.body;
-            };
-            
-            const target = getTarget();
-            target.focus();
-            
-            // 4. Dispatch 'paste' event
-            const pasteEvent = new ClipboardEvent('paste', {
-                bubbles: true,
-                cancelable: true,
-                composed: true,
-                clipboardData: dt
-            });
-            target.dispatchEvent(pasteEvent);
-            
-            // 5. Dispatch 'drop' event (Backup)
-            const dropEvent = new DragEvent('drop', {
-                bubbles: true,
-                cancelable: true,
-                composed: true,
-                dataTransfer: dt
-            });
-            target.dispatchEvent(dropEvent);
-        }"""
-        
-        page.evaluate(js_script, [encoded_file, filename, mime])
-        print("[INFO] Injected file via JS (Paste + Drop events).")
-                
+        file_input = page.locator(IMAGE_FILE_INPUT_SELECTOR).first
+        try:
+            if file_input.count() == 0:
+                return False
+            file_input.set_input_files(image_path)
+        except Exception as e:
+            logger.debug("Direct file input failed: %s", e)
+            return False
+        logger.info("Attached image through the hidden file input.")
+        return True
+
     def _core_send_image(self, context, recipient_number, image_path, caption):
         """
         Core logic: Sends image using an ACTIVE Playwright context.
@@ -543,121 +1113,97 @@ class WhatsAppWebClient:
             
             page.set_default_timeout(90000)
             
+            target_url = f"https://web.whatsapp.com/send?phone={recipient_number}"
+            
+            # Fresh page: open the chat URL straight away. WhatsApp renders the
+            # login screen on any path, so a valid session needs one navigation
+            # instead of root page + chat page.
+            opened_chat_directly = "web.whatsapp.com" not in page.url
+            if opened_chat_directly:
+                logger.info("Opening chat directly: %s", target_url)
+                page.goto(target_url)
+            
             # 1. Ensure we are logged in FIRST
             if not self._ensure_loggedin(page):
-                print("[ERROR] Authentication failed. Cannot proceed.")
+                logger.error("Authentication failed. Cannot proceed.")
                 return False
                 
-            # 2. Navigate to Specific Chat
-            target_url = f"https://web.whatsapp.com/send?phone={recipient_number}"
-            print(f"[INFO] Navigating directly to chat: {target_url}")
-            page.goto(target_url)
+            # 2. Navigate to Specific Chat (unless the direct load already opened it).
+            # A slow first render usually just needs more time, not a second full load
+            if not (opened_chat_directly and self._is_chat_open(page, timeout=15000)):
+                logger.info("Navigating directly to chat: %s", target_url)
+                page.goto(target_url)
             
             # 3. Wait for Chat Load (Handling Landing Pages)
             try:
-                print("[INFO] Waiting for chat UI...")
+                logger.info("Waiting for chat UI...")
                 # Check for "Continue to Chat" landing page
                 try:
                     landing_btn = page.locator('a[title="Share on WhatsApp"], button:has-text("Continue to Chat"), span:has-text("Continue to Chat")').first
                     if landing_btn.is_visible(timeout=5000):
-                        print("[INFO] detected 'Continue to Chat' landing page. Clicking...")
+                        logger.info("detected 'Continue to Chat' landing page. Clicking...")
                         landing_btn.click()
-                        time.sleep(2)
                         
                         web_link = page.locator('a:has-text("use WhatsApp Web"), span:has-text("use WhatsApp Web")').first
-                        if web_link.is_visible(timeout=5000):
-                             print("[INFO] Clicking 'use WhatsApp Web'...")
-                             web_link.click()
+                        web_link.wait_for(state="visible", timeout=5000)
+                        logger.info("Clicking 'use WhatsApp Web'...")
+                        web_link.click()
                 except: pass
 
                 # Wait for the chat input box specifically
-                page.wait_for_selector('div[aria-placeholder="Type a message"]', timeout=60000)
-                time.sleep(3) 
+                page.wait_for_selector(CHAT_INPUT_SELECTOR, timeout=60000)
             except Exception as e:
-                print(f"[ERROR] Chat failed to load: {e}")
+                logger.error("Chat failed to load: %s", e)
                 self._save_debug_screenshot(page, "chat_load_fail")
                 return False
 
-            # --- PHASE 2: UI-Driven File Upload ---
-            print("[INFO] Chat loaded. Triggering 'Attach' menu...")
-            
+            # --- PHASE 2: File Upload ---
             try:
-                # Click Attach (+) button - multiple selectors for robustness
-                attach_selectors = [
-                    'span[data-icon="plus"]',
-                    'span[data-icon="attach-menu-plus"]',
-                    '[data-icon="clip"]',
-                    'button[aria-label="Attach"]',
-                    '[aria-label="Attach"]',
-                    'div[title="Attach"]',
-                ]
-                
-                attach_button = None
-                for sel in attach_selectors:
+                # Fast path: hand the file to WhatsApp's hidden image input, no menu clicks
+                if not self._attach_image_directly(page, image_path):
+                    logger.info("Chat loaded. Triggering 'Attach' menu...")
+                    # Click Attach (+) button as soon as any of its known variants renders
+                    attach_button = page.locator(ATTACH_BUTTON_SELECTOR).locator("visible=true").first
                     try:
-                        btn = page.locator(sel).first
-                        if btn.is_visible(timeout=2000):
-                            attach_button = btn
-                            print(f"[INFO] Found attach button with selector: {sel}")
-                            break
-                    except:
-                        continue
-                
-                if not attach_button:
-                    print("[ERROR] Could not find Attach button.")
-                    self._save_debug_screenshot(page, "error_no_attach_button")
-                    return False
-                
-                attach_button.click(force=True)
-                time.sleep(2)
+                        attach_button.wait_for(state="visible", timeout=10000)
+                    except Exception:
+                        logger.error("Could not find Attach button.")
+                        self._save_debug_screenshot(page, "error_no_attach_button")
+                        return False
                 
-                # Photos & Videos menu item - multiple selectors for robustness
-                # WhatsApp Web UI changes frequently, so try many approaches
-                media_selectors = [
-                    '[data-icon="attach-image"]',
-                    'span[data-icon="attach-image"]',
-                    'li button[aria-label*="photo"]',
-                    'li button[aria-label*="Photo"]',
-                    'button:has-text("Photos")',
-                    'span:has-text("Photos & videos")',
-                    'li:has-text("Photos & videos")',
-                    'li:has-text("Photos")',
-                    '[aria-label*="Photos"]',
-                    '[aria-label*="photo"]',
-                    'input[accept*="image"]',  # Direct file input fallback
-                ]
+                    attach_button.click(force=True)
                 
-                media_option = None
-                for sel in media_selectors:
+                    # Photos & Videos menu item (WhatsApp Web UI changes frequently)
+                    media_option = page.locator(MEDIA_OPTION_SELECTOR).locator("visible=true").first
                     try:
-                        opt = page.locator(sel).first
-                        if opt.is_visible(timeout=1000):
-                            media_option = opt
-                            print(f"[INFO] Found media option with selector: {sel}")
-                            break
-                    except:
-                        continue
+                        media_option.wait_for(state="visible", timeout=5000)
+                    except Exception:
+                        media_option = None
                 
-                # Fallback: Try to find any file input for images
-                if not media_option:
-                    file_input = page.locator('input[type="file"][accept*="image"]').first
-                    if file_input.count() > 0:
-                        print("[INFO] Found direct file input. Using that instead.")
-                        file_input.set_input_files(image_path)
-                        time.sleep(5)
+                    # Fallback: Try to find any file input for images
+                    if media_option is None:
+                        file_input = page.locator(IMAGE_FILE_INPUT_SELECTOR).first
+                        if file_input.count() > 0:
+                            logger.info("Found direct file input. Using that instead.")
+                            file_input.set_input_files(image_path)
+                        else:
+                            logger.error("Could not find 'Photos & videos' menu item or file input.")
+                            self._save_debug_screenshot(page, "error_menu_missing")
+                            return False
                     else:
-                        print("[ERROR] Could not find 'Photos & videos' menu item or file input.")
-                        self._save_debug_screenshot(page, "error_menu_missing")
-                        return False
-                else:
-                    with page.expect_file_chooser() as fc_info:
-                        media_option.click(force=True)
+                        with page.expect_file_chooser() as fc_info:
+                            media_option.click(force=True)
                     
-                    file_chooser = fc_info.value
-                    file_chooser.set_files(image_path)
-                    time.sleep(5)
+                        file_chooser = fc_info.value
+                        file_chooser.set_files(image_path)
+                
+                # The preview modal is ready once its send button renders
+                try:
+                    page.wait_for_selector(SEND_BUTTON_SELECTOR, state="visible", timeout=30000)
+                except Exception:
+                    logger.warning("Preview send button not seen yet, continuing...")
             except Exception as e:
-                print(f"[ERROR] UI-driven upload failed: {e}")
+                logger.error("UI-driven upload failed: %s", e)
                 self._save_debug_screenshot(page, "error_upload")
                 return False
 
@@ -665,157 +1211,155 @@ class WhatsAppWebClient:
             # SKIPPED: User requested simpler explicit delays instead of complex state diffing.
             
             # --- PHASE 3: Handle Preview Modal ---
-            print("[INFO] Waiting for image preview modal...")
+            logger.info("Waiting for image preview modal...")
             try:
                 # 1. Primary Wait: Use the user-confirmed text "Type a message" 
                 # BUT we must ensure we don't just find the background one. 
-                # We wait for the COUNT of "Type a message" inputs to increase or for a NEW one.
-                
-                # Wait for the modal container or just the presence of a NEW input
-                # User Flow: Wait for fully loading
-                time.sleep(5) # explicit heavy wait for modal load (User Request)
+                # We wait for the COUNT of "Type a message" inputs to reach two (chat + modal).
+                try:
+                    page.wait_for_function(
+                        "sel => document.querySelectorAll(sel).length >= 2",
+                        arg=CAPTION_INPUT_SELECTOR, timeout=15000,
+                    )
+                except Exception:
+                    logger.warning("Modal caption input not seen yet, continuing...")
                 
                 caption_box = None
                 
                 # Find the caption box.
                 # User provided exact selector: div[aria-placeholder="Type a message"][data-lexical-editor="true"]
                 # There are TWO such elements: main chat + modal caption. Modal is the LAST one.
-                print("[INFO] Finding caption box (aria-placeholder='Type a message')...")
+                logger.info("Finding caption box (aria-placeholder='Type a message')...")
                 
                 # Target the specific Lexical editor input
-                caption_inputs = page.locator('div[aria-placeholder="Type a message"][data-lexical-editor="true"]')
-                input_count = caption_inputs.count()
-                print(f"[DEBUG] Found {input_count} matching caption inputs.")
-                
-                # Debug: Log bounding boxes of all found inputs
-                for i in range(input_count):
-                    inp = caption_inputs.nth(i)
-                    try:
-                        box = inp.bounding_box()
-                        is_vis = inp.is_visible()
-                        print(f"[DEBUG] Input {i}: visible={is_vis}, bbox={box}")
-                    except Exception as e:
-                        print(f"[DEBUG] Input {i}: error getting info: {e}")
+                caption_inputs = page.locator(CAPTION_INPUT_SELECTOR)
+                # One round trip for every input's visibility and position
+                boxes = caption_inputs.evaluate_all("""els => els.map(el => {
+                    const r = el.getBoundingClientRect();
+                    const visible = r.width > 0 && r.height > 0 && getComputedStyle(el).visibility !== 'hidden';
+                    return {visible, x: r.x, y: r.y};
+                })""")
+                input_count = len(boxes)
+                logger.debug("Found %s matching caption inputs.", input_count)
+                for i, box in enumerate(boxes):
+                    logger.debug("Input %s: %s", i, box)
                 
                 # Select the visible input with the SMALLEST y-coordinate (modal caption is higher up)
-                # The modal caption appears ABOVE the main chat input in the preview
+                # The modal caption appears ABOVE the main chat input in the preview.
+                # Modal caption should be on the RIGHT side (x > 300) AND have smaller y
                 best_candidate = None
                 best_y = float('inf')
                 
-                for i in range(input_count):
-                    inp = caption_inputs.nth(i)
-                    if inp.is_visible():
-                        box = inp.bounding_box()
-                        # Modal caption should be on the RIGHT side (x > 300) AND have smaller y
-                        if box and box.get('x', 0) > 300:
-                            y = box.get('y', float('inf'))
-                            if y < best_y:
-                                best_y = y
-                                best_candidate = inp
-                                print(f"[DEBUG] Better candidate at index {i}: y={y}")
+                for i, box in enumerate(boxes):
+                    if box['visible'] and box['x'] > 300 and box['y'] < best_y:
+                        best_y = box['y']
+                        best_candidate = caption_inputs.nth(i)
+                        logger.debug("Better candidate at index %s: y=%s", i, best_y)
                 
                 if best_candidate:
                     caption_box = best_candidate
-                    print(f"[INFO] Selected caption box with smallest y={best_y}")
+                    logger.info("Selected caption box with smallest y=%s", best_y)
                 elif input_count > 0:
                     # Fallback: just take the first one
                     caption_box = caption_inputs.first
-                    print("[WARN] Using fallback: first input")
+                    logger.warning("Using fallback: first input")
                 
                 if caption_box:
-                    print(f"[INFO] Caption box selected: {caption_box}")
-                    # Highlight with VERY visible styling
-                    try:
-                        caption_box.evaluate("""el => {
-                            el.style.outline = '5px solid red';
-                            el.style.outlineOffset = '-2px';
-                            el.style.backgroundColor = 'rgba(255, 0, 0, 0.1)';
-                        }""")
-                        self._save_debug_screenshot(page, "debug_caption_box_selected")
-                        print("[DEBUG] Highlighted caption box with red outline")
-                    except Exception as e:
-                        print(f"[WARN] Could not highlight: {e}")
+                    logger.info("Caption box selected: %s", caption_box)
+                    # Highlight with VERY visible styling (only useful in a debug frame)
+                    if self.debug_screenshots:
+                        try:
+                            caption_box.evaluate("""el => {
+                                el.style.outline = '5px solid red';
+                                el.style.outlineOffset = '-2px';
+                                el.style.backgroundColor = 'rgba(255, 0, 0, 0.1)';
+                            }""")
+                            self._save_debug_screenshot(page, "debug_caption_box_selected")
+                            logger.debug("Highlighted caption box with red outline")
+                        except Exception as e:
+                            logger.warning("Could not highlight: %s", e)
                 else:
-                    print("[ERROR] No caption box found.")
+                    logger.error("No caption box found.")
                     self._save_debug_screenshot(page, "error_no_caption_box")
                 
                 # Proceed to Typing/Sending...
 
                 
                 if caption and caption_box:
-                    print(f"[INFO] Typing caption...")
+                    logger.info("Typing caption...")
                     
                     # Focus the caption box
                     caption_box.click(force=True)
-                    time.sleep(1)
                     caption_box.focus()
                     
-                    # TYPE: Use Playwright's type() for direct text input
-                    # Split by newlines and handle them as Shift+Enter
+                    # INSERT: one insertText call per line instead of a keystroke per char.
+                    # Lexical handles the input event; newlines stay Shift+Enter
                     lines = caption.split('\n')
                     for i, line in enumerate(lines):
                         if line:
-                            caption_box.type(line, delay=10)  # 10ms delay between chars
+                            page.keyboard.insert_text(line)
                         if i < len(lines) - 1:  # Add newline except after last line
                             page.keyboard.press("Shift+Enter")
                     
-                    time.sleep(1)
-                    
-                    print("[INFO] Caption typed.")
-
-                time.sleep(2) # USER REQUEST: 1 sec explicit delay before send (made it 2s)
-                
-                print("[INFO] Sending message...")
-                send_button_candidates = page.locator('span[data-icon="send"], [data-icon="send"], [aria-label="Send"]')
-                send_button = None
+                    logger.info("Caption typed.")
                 
-                if send_button_candidates.count() > 0:
-                     send_button = send_button_candidates.last # Modal button is usually last
-                
-                if send_button and send_button.is_visible():
+                logger.info("Sending message...")
+                # Modal button is usually last; send as soon as it is clickable
+                send_button = page.locator(SEND_BUTTON_SELECTOR).last
+                try:
+                    send_button.wait_for(state="visible", timeout=10000)
+                except Exception:
+                    pass
+                if send_button.is_visible():
                      send_button.click(force=True)
                 else:
-                     print("[WARN] Send button not found. Trying global search.")
+                     logger.warning("Send button not found. Trying global search.")
                      page.locator('[data-icon="send"]').last.click(force=True)
-                     
-                time.sleep(5) # Wait for send animation
                 
                 # --- STEP 5: Verify Message Appears in DOM ---
-                print("[INFO] Verifying message in DOM...")
+                logger.info("Verifying message in DOM...")
                 try:
-                    # Wait for the image preview modal to close (it should disappear)
-                    # The send button in modal should no longer be visible
-                    time.sleep(3)
+                    # Wait for the image preview modal to close (it should disappear):
+                    # its caption input goes away, leaving only the chat's own
+                    try:
+                        page.wait_for_function(
+                            "sel => document.querySelectorAll(sel).length < 2",
+                            arg=CAPTION_INPUT_SELECTOR, timeout=15000,
+                        )
+                    except Exception:
+                        logger.warning("Preview modal still open after send.")
                     
                     # Check if our message appears in the chat
                     # Messages are typically in divs with class containing 'message-out'
                     # We'll look for the caption text in the chat area
-                    if caption:
-                        caption_snippet = caption[:20].strip()  # First 20 chars
-                        message_check = page.locator(f'div.message-out:has-text("{caption_snippet}")')
-                        if message_check.count() > 0:
-                            print("[OK] Message verified in DOM!")
-                        else:
-                            print("[WARN] Could not verify message in DOM (may still have been sent).")
+                    caption_snippet = caption[:20].strip()  # First 20 chars
+                    if caption_snippet:
+                        # filter() takes the text as data, so quotes in the caption need no escaping
+                        message_check = page.locator(OUTGOING_MESSAGE_SELECTOR).filter(has_text=caption_snippet)
+                        try:
+                            message_check.last.wait_for(state="attached", timeout=10000)
+                            logger.log(OK, "Message verified in DOM!")
+                        except Exception:
+                            logger.warning("Could not verify message in DOM (may still have been sent).")
                     
                     self._save_debug_screenshot(page, "after_send_verification")
                 except Exception as ve:
-                    print(f"[WARN] DOM verification failed: {ve}")
+                    logger.warning("DOM verification failed: %s", ve)
                 
-                print("[OK] Message send process completed.")
+                logger.log(OK, "Message send process completed.")
                 return True
 
             except Exception as e:
-                print(f"[ERROR] Caption/Send failed: {e}")
+                logger.error("Caption/Send failed: %s", e)
                 self._save_debug_screenshot(page, "error_send_flow")
                 return False
         except Exception as e:
-            print(f"[ERROR] Automation error: {e}")
+            logger.error("Automation error: %s", e)
             return False
 
     def send_image(self, recipient_number, image_path, caption="", browser=None):
         """Send a single image via WhatsApp Web"""
-        print(f"[INFO] Sending single image to {recipient_number}...")
+        logger.info("Sending single image to %s...", recipient_number)
         
         if browser:
             # Legacy/Manual mode: use provided browser instance
@@ -830,19 +1374,24 @@ class WhatsAppWebClient:
                 self.stop()
                 return result
             except Exception as e:
-                print(f"[ERROR] Single send failed: {e}")
+                logger.error("Single send failed: %s", e)
                 self.stop()
                 return False
 
     def send_to_multiple(self, image_path, recipient_numbers, caption="", delay_seconds=5, browser=None):
-        """Batch sender with persistent session support"""
+        """
+        Batch sender with persistent session support.
+        delay_seconds is the minimum spacing between the start of consecutive
+        sends; a send that already took that long is followed immediately.
+        """
         successful_sends = 0
         failed_sends = 0
         
         def _loop(context_instance):
             nonlocal successful_sends, failed_sends
             for idx, recipient in enumerate(recipient_numbers, 1):
-                print(f"\n[{idx}/{len(recipient_numbers)}] Sending to {recipient}...")
+                logger.info("[%s/%s] Sending to %s...", idx, len(recipient_numbers), recipient)
+                send_started = time.monotonic()
                 
                 if self._core_send_image(context_instance, recipient, image_path, caption):
                     successful_sends += 1
@@ -850,36 +1399,36 @@ class WhatsAppWebClient:
                     failed_sends += 1
                 
                 if idx < len(recipient_numbers):
-                    wait_time = delay_seconds + 5
-                    print(f"[INFO] Waiting {wait_time}s...")
-                    time.sleep(wait_time)
+                    wait_time = delay_seconds - (time.monotonic() - send_started)
+                    if wait_time > 0:
+                        logger.info("Waiting %.1fs...", wait_time)
+                        time.sleep(wait_time)
         
         if browser:
             # Legacy mode
             _loop(self._get_context(browser))
         else:
              # Native Persistent Mode (Efficient)
-             print("[INFO] Batch Mode: Using persistent Native session...")
+             logger.info("Batch Mode: Using persistent Native session...")
              try:
                  context = self.start()
                  _loop(context)
                  time.sleep(2)
                  self.stop()
              except Exception as e:
-                 print(f"[ERROR] Batch send failed: {e}")
+                 logger.error("Batch send failed: %s", e)
                  self.stop()
         
         # Auto-cleanup corrupted profile if ALL sends failed
         if failed_sends == len(recipient_numbers) and failed_sends > 0:
-            print("[WARN] All sends failed. Clearing potentially corrupted profile...")
+            logger.warning("All sends failed. Clearing potentially corrupted profile...")
             try:
-                import shutil
                 if os.path.exists(self.profile_dir):
                     shutil.rmtree(self.profile_dir)
-                    print(f"[INFO] Deleted profile: {self.profile_dir}")
-                    print("[INFO] A fresh QR login will be required on next run.")
+                    logger.info("Deleted profile: %s", self.profile_dir)
+                    logger.info("A fresh QR login will be required on next run.")
             except Exception as e:
-                print(f"[ERROR] Failed to delete profile: {e}")
+                logger.error("Failed to delete profile: %s", e)
         
         return successful_sends, failed_sends
 
@@ -888,50 +1437,144 @@ class WhatsAppWebClient:
 class WhatsAppManager:
     """Manages WhatsApp Business Cloud API operations"""
     
-    def __init__(self, phone_number_id, access_token):
+    # Graph API accepts at most 50 sub-requests per batch call
+    BATCH_LIMIT = 50
+    
+    def __init__(self, phone_number_id, access_token, use_batch=False, max_workers=4, cache_dir="cache"):
         self.phone_number_id = phone_number_id
         self.access_token = access_token
         self.api_base_url = "https://graph.facebook.com/v21.0"
-    
-    def upload_media(self, image_path):
-        """Upload media to WhatsApp Cloud API and get media ID"""
-        url = f"{self.api_base_url}/{self.phone_number_id}/media"
+        self.use_batch = use_batch
+        # Upper bound on in-flight message POSTs (at least one)
+        self.max_workers = max(int(max_workers), 1)
         
-        headers = {
-            "Authorization": f"Bearer {self.access_token}"
-        }
+        # Endpoints are fixed per phone number, so build them once
+        self.media_url = f"{self.api_base_url}/{self.phone_number_id}/media"
+        self.messages_url = f"{self.api_base_url}/{self.phone_number_id}/messages"
+        self.batch_url = f"{self.api_base_url}/"
+        self._messages_relative_url = f"{self.phone_number_id}/messages"
         
-        files = {
-            "file": ("screenshot.png", open(image_path, "rb"), "image/png")
-        }
+        # Persistent session: keeps the connection to graph.facebook.com alive.
+        # One pooled socket per send worker lets every thread reuse its TLS session.
+        self.session = create_http_session(pool_maxsize=self.max_workers)
+        self.session.headers.update({"Authorization": f"Bearer {self.access_token}"})
+        # Streamed multipart bodies cannot be rewound, so urllib3 may only retry
+        # uploads that never reached the server; upload_media retries statuses itself
+        self.session.mount(self.media_url, HTTPAdapter(
+            pool_maxsize=1,
+            max_retries=Retry(total=3, connect=3, read=0, other=0, status=0, backoff_factor=0.5),
+        ))
+        # A batch may be partly processed before any error status, so it is never
+        # resent on status either. batch_url prefixes every API URL, so /messages
+        # is mounted back onto the session's default adapter.
+        self.session.mount(self.messages_url, self.session.get_adapter(self.messages_url))
+        self.session.mount(self.batch_url, HTTPAdapter(
+            pool_maxsize=1,
+            max_retries=Retry(total=3, connect=3, read=0, other=0, status=0, backoff_factor=0.5),
+        ))
+        # SHA-256 of uploaded file -> [media_id, upload time], so an unchanged
+        # screenshot is not uploaded again on a later retry, tick or run
+        self.media_cache_path = os.path.join(cache_dir, "media_ids.json")
+        self._media_cache = self._load_media_cache()
+    
+    def _load_media_cache(self):
+        """Load unexpired media IDs uploaded from this phone number, or {} if unavailable"""
+        try:
+            with open(self.media_cache_path, 'r') as f:
+                cache = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if not isinstance(cache, dict) or cache.get("phone_number_id") != self.phone_number_id:
+            return {}
+        now = time.time()
+        try:
+            return {
+                digest: [entry[0], entry[1]] for digest, entry in cache.get("media", {}).items()
+                if isinstance(entry[0], str) and now - entry[1] < MEDIA_ID_TTL
+            }
+        except (TypeError, IndexError, KeyError, AttributeError) as e:
+            # Valid JSON of the wrong shape; the IDs are only an optimization
+            logger.debug("Ignoring malformed media ID cache: %s", e)
+            return {}
+    
+    def _save_media_cache(self):
+        """Persist the media ID cache (write-then-rename so a crash can't corrupt it)"""
+        tmp_path = self.media_cache_path + ".tmp"
+        try:
+            os.makedirs(os.path.dirname(self.media_cache_path) or ".", exist_ok=True)
+            with open(tmp_path, 'w') as f:
+                json.dump({"phone_number_id": self.phone_number_id, "media": self._media_cache}, f)
+            os.replace(tmp_path, self.media_cache_path)
+        except OSError as e:
+            logger.warning("Could not save media ID cache: %s", e)
+    
+    def close(self):
+        """Close the pooled HTTP session"""
+        self.session.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+    
+    def upload_media(self, image_path, attempts=3):
+        """Upload media to WhatsApp Cloud API and get media ID (reused while the file is unchanged)"""
+        try:
+            with open(image_path, "rb") as fh:
+                digest = hashlib.file_digest(fh, "sha256").hexdigest()
+        except OSError as e:
+            logger.error("Cannot read media file %s: %s", image_path, e)
+            return None
         
-        data = {
-            "messaging_product": "whatsapp"
-        }
+        mime_type = "image/jpeg" if image_path.lower().endswith((".jpg", ".jpeg")) else "image/png"
+        cached = self._media_cache.get(digest)
+        if cached and time.time() - cached[1] < MEDIA_ID_TTL:
+            logger.info("Reusing uploaded media ID: %s", cached[0])
+            return cached[0]
         
         try:
-            response = requests.post(url, headers=headers, data=data, files=files)
+            for attempt in range(attempts):
+                # Context manager guarantees the descriptor is closed, even on failure
+                with open(image_path, "rb") as fh:
+                    # Streams the image from disk in chunks instead of building the body in memory
+                    encoder = MultipartEncoder(fields={
+                        "messaging_product": "whatsapp",
+                        "file": (os.path.basename(image_path), fh, mime_type),
+                    })
+                    response = self.session.post(
+                        self.media_url,
+                        data=encoder,
+                        headers={"Content-Type": encoder.content_type},
+                        timeout=UPLOAD_TIMEOUT,
+                    )
+                if response.status_code not in RETRY_STATUSES or attempt == attempts - 1:
+                    break
+                # Honor the server's Retry-After (seconds form), like the session's urllib3 Retry does
+                retry_after = response.headers.get("Retry-After", "")
+                delay = min(int(retry_after), 60) if retry_after.isdigit() else 0.5 * 2 ** attempt
+                logger.warning("Media upload got HTTP %s, retrying in %ss...", response.status_code, delay)
+                time.sleep(delay)
             response.raise_for_status()
             
-            media_id = response.json().get("id")
-            print(f"[OK] Media uploaded successfully! Media ID: {media_id}")
+            media_id = json.loads(response.content).get("id")
+            logger.log(OK, "Media uploaded successfully! Media ID: %s", media_id)
+            if media_id:
+                self._media_cache[digest] = [media_id, time.time()]
+                self._save_media_cache()
             return media_id
             
         except requests.exceptions.RequestException as e:
-            print(f"[ERROR] Media upload failed: {e}")
+            logger.error("Media upload failed: %s", e)
             if hasattr(e.response, 'text'):
-                print(f"Error details: {e.response.text}")
+                logger.error("Error details: %s", e.response.text)
+            return None
+        except ValueError as e:
+            logger.error("Media upload returned invalid JSON: %s", e)
             return None
     
     def send_image(self, recipient_number, media_id, caption=""):
         """Send image message via WhatsApp Business Cloud API"""
-        url = f"{self.api_base_url}/{self.phone_number_id}/messages"
-        
-        headers = {
-            "Authorization": f"Bearer {self.access_token}",
-            "Content-Type": "application/json"
-        }
-        
         payload = {
             "messaging_product": "whatsapp",
             "recipient_type": "individual",
@@ -944,29 +1587,27 @@ class WhatsAppManager:
         }
         
         try:
-            response = requests.post(url, headers=headers, json=payload)
+            response = self.session.post(self.messages_url, json=payload, timeout=HTTP_TIMEOUT)
             response.raise_for_status()
-            
-            result = response.json()
-            message_id = result.get("messages", [{}])[0].get("id")
-            print(f"[OK] WhatsApp message sent successfully! Message ID: {message_id}")
-            return True
-            
         except requests.exceptions.RequestException as e:
-            print(f"[ERROR] Failed to send WhatsApp message: {e}")
+            logger.error("Failed to send WhatsApp message: %s", e)
             if hasattr(e.response, 'text'):
-                print(f"Error details: {e.response.text}")
+                logger.error("Error details: %s", e.response.text)
             return False
+        
+        # A 2xx means Graph accepted the message; an unreadable body must not
+        # turn it into a failure, or the next tick would send it again
+        try:
+            result = json.loads(response.content)
+            message_id = result.get("messages", [{}])[0].get("id")
+        except (ValueError, LookupError, AttributeError, TypeError) as e:
+            logger.warning("WhatsApp message accepted but response was unreadable: %s", e)
+            message_id = "unknown"
+        logger.log(OK, "WhatsApp message sent successfully! Message ID: %s", message_id)
+        return True
     
     def send_text(self, recipient_number, message):
         """Send text message via WhatsApp Business Cloud API"""
-        url = f"{self.api_base_url}/{self.phone_number_id}/messages"
-        
-        headers = {
-            "Authorization": f"Bearer {self.access_token}",
-            "Content-Type": "application/json"
-        }
-        
         payload = {
             "messaging_product": "whatsapp",
             "recipient_type": "individual",
@@ -979,159 +1620,383 @@ class WhatsAppManager:
         }
         
         try:
-            response = requests.post(url, headers=headers, json=payload)
+            response = self.session.post(self.messages_url, json=payload, timeout=HTTP_TIMEOUT)
             response.raise_for_status()
-            print(f"[OK] Text message sent successfully!")
+            logger.log(OK, "Text message sent successfully!")
             return True
             
         except requests.exceptions.RequestException as e:
-            print(f"[ERROR] Failed to send text message: {e}")
+            logger.error("Failed to send text message: %s", e)
             if hasattr(e.response, 'text'):
-                print(f"Error details: {e.response.text}")
+                logger.error("Error details: %s", e.response.text)
             return False
     
     def send_screenshot(self, image_path, recipient_number, caption="Court Cause List Screenshot"):
         """Complete workflow: Upload media and send via WhatsApp"""
-        print("[INFO] Uploading image to WhatsApp...")
+        logger.info("Uploading image to WhatsApp...")
         media_id = self.upload_media(image_path)
         
         if not media_id:
             return False
         
-        print(f"[INFO] Sending to WhatsApp number: {recipient_number}")
+        logger.info("Sending to WhatsApp number: %s", recipient_number)
         return self.send_image(recipient_number, media_id, caption)
     
-    def send_to_multiple(self, image_path, recipient_numbers, caption="", delay_seconds=2):
-        """Send screenshot to multiple recipients with delay between sends"""
+    def send_image_batch(self, recipient_numbers, media_id, caption=""):
+        """
+        Send the same image to many recipients through Graph API batch requests,
+        collapsing N message POSTs into one round trip per BATCH_LIMIT recipients.
+        Returns (sent, pending): pending recipients were rejected or skipped
+        (4xx or null sub-result) and are safe to retry individually. Recipients
+        whose outcome is unknown (5xx sub-result, timeout) are in neither list.
+        """
+        image = json.dumps({"id": media_id, "caption": caption})
+        sent = []
+        pending = []
+        
+        for start in range(0, len(recipient_numbers), self.BATCH_LIMIT):
+            chunk = recipient_numbers[start:start + self.BATCH_LIMIT]
+            batch = [
+                {
+                    "method": "POST",
+                    "relative_url": self._messages_relative_url,
+                    "body": urlencode({
+                        "messaging_product": "whatsapp",
+                        "recipient_type": "individual",
+                        "to": recipient,
+                        "type": "image",
+                        "image": image,
+                    }),
+                }
+                for recipient in chunk
+            ]
+            
+            try:
+                response = self.session.post(
+                    self.batch_url,
+                    data={"batch": json.dumps(batch), "include_headers": "false"},
+                    timeout=HTTP_TIMEOUT
+                )
+                response.raise_for_status()
+                results = json.loads(response.content)
+            except requests.exceptions.RequestException as e:
+                if failed_before_send(e):
+                    logger.warning("Batch send could not connect, falling back to single sends: %s", e)
+                    pending.extend(chunk)
+                else:
+                    # The batch may have been processed; retrying could double-send
+                    logger.error("Batch send of %s recipient(s) has unknown outcome, not retrying: %s", len(chunk), e)
+                continue
+            except ValueError as e:
+                logger.error("Batch response unreadable, %s recipient(s) have unknown outcome, not retrying: %s", len(chunk), e)
+                continue
+            
+            if not isinstance(results, list) or len(results) != len(chunk):
+                logger.error("Batch response did not match the %s sub-request(s), outcome unknown, not retrying.", len(chunk))
+                continue
+            
+            for recipient, result in zip(chunk, results):
+                # A null entry means Graph did not process that sub-request
+                if result is None:
+                    pending.append(recipient)
+                    continue
+                code = result.get("code") if isinstance(result, dict) else None
+                if not isinstance(code, int):
+                    logger.error("Batch send to %s returned no status, not retrying.", recipient)
+                elif 200 <= code < 300:
+                    sent.append(recipient)
+                elif 400 <= code < 500:
+                    pending.append(recipient)
+                else:
+                    # Like a timeout: the message may have gone out, so don't resend
+                    logger.error("Batch send to %s returned HTTP %s, not retrying.", recipient, code)
+        
+        logger.info("Batch send confirmed %s/%s recipient(s).", len(sent), len(recipient_numbers))
+        return sent, pending
+    
+    def send_to_multiple(self, image_path, recipient_numbers, caption="", max_per_second=5):
+        """
+        Upload the screenshot once and send it to multiple recipients concurrently.
+        Requests are I/O-bound, so a small thread pool overlaps them while the
+        token bucket keeps us under the Cloud API rate limit.
+        """
         successful_sends = 0
         failed_sends = 0
         
-        for idx, recipient in enumerate(recipient_numbers, 1):
-            print(f"\n[{idx}/{len(recipient_numbers)}] Sending to {recipient}...")
-            success = self.send_screenshot(image_path, recipient, caption=caption)
-            
-            if success:
-                successful_sends += 1
-            else:
-                failed_sends += 1
+        if not recipient_numbers:
+            return successful_sends, failed_sends
+        
+        # Media IDs are reusable across messages, so upload the image only once
+        logger.info("Uploading image to WhatsApp...")
+        media_id = self.upload_media(image_path)
+        if not media_id:
+            return successful_sends, len(recipient_numbers)
+        
+        if self.use_batch:
+            sent, pending = self.send_image_batch(recipient_numbers, media_id, caption)
+            successful_sends += len(sent)
+            # Recipients lost to an ambiguous timeout or 5xx are neither sent nor pending
+            failed_sends += len(recipient_numbers) - len(sent) - len(pending)
+            recipient_numbers = pending
+            if not recipient_numbers:
+                return successful_sends, failed_sends
+        
+        limiter = RateLimiter(max_per_second)
+        
+        def _send_one(recipient):
+            limiter.acquire()
+            return self.send_image(recipient, media_id, caption)
+        
+        workers = min(self.max_workers, len(recipient_numbers))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(_send_one, recipient): recipient for recipient in recipient_numbers}
             
-            # Add delay between sends to avoid rate limiting
-            if idx < len(recipient_numbers):
-                time.sleep(delay_seconds)
+            for idx, future in enumerate(as_completed(futures), 1):
+                recipient = futures[future]
+                try:
+                    success = future.result()
+                except Exception as e:
+                    logger.error("Send to %s raised: %s", recipient, e)
+                    success = False
+                
+                if success:
+                    successful_sends += 1
+                else:
+                    failed_sends += 1
+                logger.info("[%s/%s] %s: %s", idx, len(recipient_numbers), recipient, 'sent' if success else 'failed')
         
         return successful_sends, failed_sends
 
 
-def is_within_time_window(start_hour=20, start_minute=0, end_hour=23, end_minute=30):
+def parse_recipient_numbers(raw_numbers):
+    """
+    Parse a comma-separated RECIPIENT_NUMBER value into a de-duplicated list.
+    Spaces, dashes, dots and parentheses are stripped first, so formatted
+    numbers still match. Malformed or empty entries are dropped up front
+    instead of costing a failed send each.
+    """
+    recipients = []
+    for entry in raw_numbers.split(','):
+        number = PHONE_FORMATTING_PATTERN.sub('', entry)
+        if not number:
+            continue
+        if PHONE_NUMBER_PATTERN.fullmatch(number):
+            recipients.append(number)
+        else:
+            logger.warning("Ignoring invalid recipient number: %r", entry.strip())
+    
+    # dict.fromkeys keeps the first occurrence order while dropping repeats
+    return list(dict.fromkeys(recipients))
+
+
+def is_within_time_window(start_minutes=WINDOW_START_MINUTES, end_minutes=WINDOW_END_MINUTES, now=None):
     """Check if current time is within the specified time window (8:00 PM to 11:30 PM IST)"""
-    now = datetime.now(IST)
-    current_minutes = now.hour * 60 + now.minute
-    start_minutes = start_hour * 60 + start_minute
-    end_minutes = end_hour * 60 + end_minute
-    return start_minutes <= current_minutes <= end_minutes
+    now = now or datetime.now(IST)
+    return start_minutes <= now.hour * 60 + now.minute <= end_minutes
+
+
+def next_check_time(now, sent_today=False, interval_minutes=10):
+    """
+    Return the next IST time the scheduler needs to wake up: the next
+    interval slot inside tonight's window, or tomorrow's window start.
+    """
+    window_start = now.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(minutes=WINDOW_START_MINUTES)
+    window_end = now.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(minutes=WINDOW_END_MINUTES)
+    
+    if not sent_today and now < window_end:
+        if now < window_start:
+            return window_start
+        slot = now.replace(second=0, microsecond=0) + timedelta(
+            minutes=interval_minutes - now.minute % interval_minutes
+        )
+        if slot <= window_end:
+            return slot
+    
+    return window_start + timedelta(days=1)
+
+
+def sleep_until(target):
+    """Block until the given timezone-aware datetime"""
+    time.sleep(max(0, (target - datetime.now(target.tzinfo)).total_seconds()))
+
+
+# Marker recording the IST date of the last successful send
+SENT_MARKER_FILE = os.path.join("cache", "sent_today.txt")
+
+# Last marker contents seen by was_message_sent_today, keyed by file mtime
+_sent_marker_cache = {"mtime": None, "date": None}
 
 
 def get_sent_marker_file():
     """Get the path to the marker file that tracks if message was sent today"""
-    cache_dir = "cache"
-    os.makedirs(cache_dir, exist_ok=True)
-    return os.path.join(cache_dir, "sent_today.txt")
+    return SENT_MARKER_FILE
 
 
-def was_message_sent_today():
+def was_message_sent_today(today=None):
     """Check if message was already sent today"""
     marker_file = get_sent_marker_file()
-    if os.path.exists(marker_file):
+    try:
+        mtime = os.stat(marker_file).st_mtime
+    except FileNotFoundError:
+        return False
+    
+    # The marker is rewritten on every send, so a file last modified on an
+    # earlier day cannot hold today's date - skip opening it entirely.
+    today = today or datetime.now(IST)
+    if datetime.fromtimestamp(mtime, IST).date() != today.date():
+        return False
+    
+    # Same mtime as the last read means same contents - reuse the cached date
+    if _sent_marker_cache["mtime"] != mtime:
         with open(marker_file, 'r') as f:
-            sent_date = f.read().strip()
-            today_str = datetime.now(IST).strftime('%Y-%m-%d')
-            return sent_date == today_str
-    return False
+            _sent_marker_cache["date"] = f.read().strip()
+        _sent_marker_cache["mtime"] = mtime
+    return _sent_marker_cache["date"] == today.date().isoformat()
 
 
-def mark_message_sent():
+def mark_message_sent(today=None):
     """Mark that message was sent today"""
     marker_file = get_sent_marker_file()
-    with open(marker_file, 'w') as f:
-        f.write(datetime.now(IST).strftime('%Y-%m-%d'))
-    print("[INFO] Marked message as sent for today")
-
-
-def send_cause_list():
-    """Send cause list screenshot via WhatsApp - returns True if sent successfully"""
-    # Load environment variables
-    load_dotenv()
+    marker_dir = os.path.dirname(marker_file)
+    # Only the writer needs the directory; readers treat a missing file as "not sent"
+    os.makedirs(marker_dir, exist_ok=True)
     
-    today = datetime.now(IST)
+    # Write-then-rename so a crash never leaves a truncated marker (which would re-send)
+    tmp_file = marker_file + ".tmp"
+    sent_date = (today or datetime.now(IST)).strftime('%Y-%m-%d')
+    with open(tmp_file, 'w') as f:
+        f.write(sent_date)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_file, marker_file)
     
-    # Configuration
-    TARGET_URL = "https://patnahighcourt.gov.in/causelist/auin/view/4079/0/CLIST"
+    # Persist the rename itself (POSIX only; directories can't be opened on Windows)
+    if hasattr(os, "O_DIRECTORY"):
+        dir_fd = os.open(marker_dir, os.O_DIRECTORY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
     
+    # We know what we just wrote; later checks only need a stat, not a re-read
+    _sent_marker_cache["mtime"] = os.stat(marker_file).st_mtime
+    _sent_marker_cache["date"] = sent_date
+    logger.info("Marked message as sent for today")
+
+
+def create_whatsapp_manager():
+    """Build a Cloud API WhatsAppManager from the environment"""
+    return WhatsAppManager(
+        phone_number_id=os.getenv("PHONE_NUMBER_ID"),
+        access_token=os.getenv("ACCESS_TOKEN"),
+        use_batch=os.getenv("WHATSAPP_BATCH_SEND", "false").lower() in ("1", "true", "yes"),
+        max_workers=int(os.getenv("WHATSAPP_SEND_CONCURRENCY", "4"))
+    )
+
+
+@lru_cache(maxsize=1)
+def load_send_settings():
+    """
+    Read and validate the send settings from the environment.
+    Cached after the first successful call, since .env is loaded once at startup;
+    invalid settings raise ValueError (and are re-checked on the next call).
+    
+    Returns:
+        (backend, recipient_numbers) with backend "OFFICIAL" or "WEB"
+    """
     # ----------------------------------------------------
     # BACKEND SELECTION
     # ----------------------------------------------------
     # "OFFICIAL" -> WhatsApp Business Cloud API (Meta)
     # "WEB"      -> Native WhatsApp Web Automation (Camoufox)
-    WHATSAPP_BACKEND = os.getenv("WHATSAPP_BACKEND", "OFFICIAL").upper()
-    
-    PHONE_NUMBER_ID = os.getenv("PHONE_NUMBER_ID")
-    ACCESS_TOKEN = os.getenv("ACCESS_TOKEN")
-    RECIPIENT_NUMBERS_STR = os.getenv("RECIPIENT_NUMBER")
+    backend = os.getenv("WHATSAPP_BACKEND", "OFFICIAL").upper()
+    recipient_numbers_str = os.getenv("RECIPIENT_NUMBER")
     
     # Validate environment variables based on Backend
-    if not RECIPIENT_NUMBERS_STR:
+    if not recipient_numbers_str:
          raise ValueError("[ERROR] Missing 'RECIPIENT_NUMBER' in .env file.")
          
-    if WHATSAPP_BACKEND == "OFFICIAL":
-        if not PHONE_NUMBER_ID or not ACCESS_TOKEN:
+    if backend == "OFFICIAL":
+        if not os.getenv("PHONE_NUMBER_ID") or not os.getenv("ACCESS_TOKEN"):
             raise ValueError("[ERROR] Missing 'PHONE_NUMBER_ID' or 'ACCESS_TOKEN' for OFFICIAL backend. Check .env file.")
     
-    # Parse multiple recipient numbers (comma-separated)
-    recipient_numbers = [num.strip() for num in RECIPIENT_NUMBERS_STR.split(',')]
+    # Parse multiple recipient numbers (comma-separated); a tuple so the cached value can't be mutated
+    recipient_numbers = tuple(parse_recipient_numbers(recipient_numbers_str))
+    if not recipient_numbers:
+        raise ValueError("[ERROR] No valid numbers in 'RECIPIENT_NUMBER'. Check .env file.")
+    
+    return backend, recipient_numbers
+
+
+def send_cause_list(today=None, screenshot_manager=None, whatsapp_manager=None):
+    """
+    Send cause list screenshot via WhatsApp - returns True if sent successfully.
+    Managers passed in (e.g. by the scheduler) are reused and left open;
+    any created here are closed before returning.
+    """
+    # One clock reading per tick, shared by every date comparison below
+    today = today or datetime.now(IST)
+    
+    # Cheapest gate first: no page fetch or browser work once today's list went out
+    if was_message_sent_today(today):
+        logger.log(SKIP, "Cause list already sent today")
+        return False
+    
+    # Environment is validated and parsed once per process, not on every tick
+    WHATSAPP_BACKEND, recipient_numbers = load_send_settings()
     
     # Initialize screenshot manager
-    screenshot_manager = ScreenshotManager(
-        target_url=TARGET_URL,
-        cache_dir="cache"
-    )
+    owns_screenshot_manager = screenshot_manager is None
+    if owns_screenshot_manager:
+        screenshot_manager = ScreenshotManager(
+            target_url=TARGET_URL,
+            cache_dir="cache"
+        )
     
-    # Unified step: Extract date AND take screenshot (if possible)
-    cause_list_date, screenshot_path = screenshot_manager.process_webpage()
+    try:
+        # Skip the browser entirely if the page has not changed since the last check
+        if screenshot_manager.is_page_unchanged(today):
+            logger.log(SKIP, "Cause list page unchanged since last check")
+            return False
+        
+        # Unified step: Extract date AND take screenshot (if possible)
+        cause_list_date, screenshot_path = screenshot_manager.process_webpage(today=today)
+    finally:
+        if owns_screenshot_manager:
+            screenshot_manager.close()
     
     # If no date found, skip
     if not cause_list_date:
-        print("[ERROR] Could not determine cause list date")
+        logger.error("Could not determine cause list date")
         return False
     
     # Check if cause list date is greater than today
     if cause_list_date.date() <= today.date():
-        print(f"[SKIP] Cause list date ({cause_list_date.strftime('%d-%m-%Y')}) is not greater than today ({today.strftime('%d-%m-%Y')})")
-        # Optimization: Delete the screenshot taken if we don't need it
-        if screenshot_path and os.path.exists(screenshot_path):
-            try:
-                os.remove(screenshot_path)
-            except:
-                pass
+        logger.log(SKIP, "Cause list date (%s) is not greater than today (%s)", cause_list_date.strftime('%d-%m-%Y'), today.strftime('%d-%m-%Y'))
         return False
     
+    # Tomorrow's list is out, so no more page checks today; free the browser
+    # before the WEB backend starts its own Playwright session
+    screenshot_manager.release_browser()
+    
     print("=" * 50)
     print("Court Cause List Screenshot to WhatsApp")
     print(f"Today: {today.strftime('%A, %d-%m-%Y')}")
     print(f"Cause List Date: {cause_list_date.strftime('%A, %d-%m-%Y')}")
     print("=" * 50)
     
-    print(f"[INFO] Using WhatsApp Backend: {WHATSAPP_BACKEND}")
+    logger.info("Using WhatsApp Backend: %s", WHATSAPP_BACKEND)
     
     caption = f"Patna High Court Cause List\n{cause_list_date.strftime('%d-%m-%Y')}"
     
     # In unified flow, screenshot_path is already returned
     if not screenshot_path or not os.path.exists(screenshot_path):
-        print("[ERROR] Screenshot file missing despite successful date extraction")
+        logger.error("Screenshot file missing despite successful date extraction")
         return False
         
-    print(f"[INFO] Cached file: {screenshot_path}")
+    logger.info("Cached file: %s", screenshot_path)
     print("\n" + "=" * 50)
-    print(f"[INFO] Sending to {len(recipient_numbers)} recipient(s)...")
+    logger.info("Sending to %s recipient(s)...", len(recipient_numbers))
     print("=" * 50)
     
     successful_sends = 0
@@ -1149,27 +2014,23 @@ def send_cause_list():
     else:
         # --- Official Cloud API (Default) ---
         # Initialize WhatsApp manager
-        whatsapp_manager = WhatsAppManager(
-            phone_number_id=PHONE_NUMBER_ID,
-            access_token=ACCESS_TOKEN
-        )
-        
-        successful_sends, failed_sends = whatsapp_manager.send_to_multiple(
-            screenshot_path,
-            recipient_numbers,
-            caption=caption,
-            delay_seconds=2
-        )
+        manager_context = nullcontext(whatsapp_manager) if whatsapp_manager else create_whatsapp_manager()
+        with manager_context as whatsapp_manager:
+            successful_sends, failed_sends = whatsapp_manager.send_to_multiple(
+                screenshot_path,
+                recipient_numbers,
+                caption=caption
+            )
     
     # Clean up temp file after sending
-    if os.path.exists(screenshot_path):
+    with suppress(FileNotFoundError):
         os.remove(screenshot_path)
-        print(f"[INFO] Temp file deleted: {screenshot_path}")
+        logger.info("Temp file deleted: %s", screenshot_path)
     
     print("\n" + "=" * 50)
-    print(f"[OK] Successfully sent: {successful_sends}/{len(recipient_numbers)}")
+    logger.log(OK, "Successfully sent: %s/%s", successful_sends, len(recipient_numbers))
     if failed_sends > 0:
-        print(f"[ERROR] Failed sends: {failed_sends}/{len(recipient_numbers)}")
+        logger.error("Failed sends: %s/%s", failed_sends, len(recipient_numbers))
     print("=" * 50)
     
     return successful_sends > 0
@@ -1177,7 +2038,8 @@ def send_cause_list():
 
 def run_scheduler():
     """
-    Run the scheduler that checks every 10 minutes between 9:30 PM and 11:30 PM.
+    Run the scheduler that checks every 10 minutes between 8:00 PM and 11:30 PM,
+    sleeping through the rest of the day until the window opens.
     Sends WhatsApp message when cause list date is greater than today.
     """
     print("=" * 50)
@@ -1186,39 +2048,56 @@ def run_scheduler():
     print("Check interval: Every 10 minutes")
     print("=" * 50)
     
-    CHECK_INTERVAL_SECONDS = 10 * 60  # 10 minutes
+    # Managers (and their pooled HTTP sessions) live for the whole scheduler run
+    screenshot_manager = ScreenshotManager(target_url=TARGET_URL, cache_dir="cache")
+    whatsapp_manager = None
+    if (os.getenv("WHATSAPP_BACKEND", "OFFICIAL").upper() != "WEB"
+            and os.getenv("PHONE_NUMBER_ID") and os.getenv("ACCESS_TOKEN")):
+        whatsapp_manager = create_whatsapp_manager()
     
-    
-    while True:
-        now = datetime.now(IST)
-        
-        # Check if within time window (8:00 PM to 11:30 PM IST)
-        if not is_within_time_window():
-            print(f"\n[{now.strftime('%H:%M:%S')}] [SKIP] Outside active window (8:00 PM - 11:30 PM IST)")
-            print("[INFO] Waiting for next check...")
-            time.sleep(CHECK_INTERVAL_SECONDS)
-            continue
-        
-        # Check if message was already sent today
-        if was_message_sent_today():
-            print(f"\n[{now.strftime('%H:%M:%S')}] [OK] Message already sent today - Skipping")
-            time.sleep(CHECK_INTERVAL_SECONDS)
-            continue
-        
-        print(f"\n[{now.strftime('%H:%M:%S')}] [INFO] Checking cause list...")
-        
-        try:
-            # Try to send cause list
-            if send_cause_list():
-                mark_message_sent()
-                print("[OK] Message sent successfully! Will resume checking tomorrow.")
+    try:
+        while True:
+            now = datetime.now(IST)
+            clock = now.strftime('%H:%M:%S')
+            # Marker is read once per tick; a send below is the only thing that changes it
+            sent_today = was_message_sent_today(now)
+            
+            # Check if within time window (8:00 PM to 11:30 PM IST)
+            if not is_within_time_window(now=now):
+                logger.log(SKIP, "[%s] Outside active window (8:00 PM - 11:30 PM IST)", clock)
+            
+            # Check if message was already sent today
+            elif sent_today:
+                logger.log(OK, "[%s] Message already sent today - Skipping", clock)
+            
             else:
-                print("[INFO] Cause list not ready yet. Will check again in 10 minutes.")
-        except Exception as e:
-            print(f"[ERROR] Error during execution: {e}")
-        
-        print(f"[INFO] Next check in 10 minutes...")
-        time.sleep(CHECK_INTERVAL_SECONDS)
+                logger.info("[%s] Checking cause list...", clock)
+                
+                try:
+                    # Try to send cause list
+                    if send_cause_list(now, screenshot_manager, whatsapp_manager):
+                        mark_message_sent(now)
+                        sent_today = True
+                        logger.log(OK, "Message sent successfully! Will resume checking tomorrow.")
+                    else:
+                        logger.info("Cause list not ready yet. Will check again in 10 minutes.")
+                except Exception as e:
+                    logger.error("Error during execution: %s", e)
+            
+            # Sleep straight to the next useful tick instead of polling all day
+            # Fresh reading: a send can take minutes. The window closes well
+            # before midnight, so sent_today still refers to the same day.
+            now = datetime.now(IST)
+            wakeup = next_check_time(now, sent_today=sent_today)
+            if wakeup.date() != now.date():
+                # Done for tonight; don't hold a browser open until tomorrow
+                screenshot_manager.release_browser()
+            logger.info("Next check at %s IST", wakeup.strftime('%d-%m-%Y %H:%M'))
+            sleep_until(wakeup)
+    finally:
+        screenshot_manager.close()
+        if whatsapp_manager:
+            whatsapp_manager.close()
 
 
 def check_whatsapp_login():
@@ -1227,13 +2106,11 @@ def check_whatsapp_login():
     If not logged in, prompt user to scan QR code before starting scheduler.
     Returns True if logged in successfully, False otherwise.
     """
-    load_dotenv()
-    
     WHATSAPP_BACKEND = os.getenv("WHATSAPP_BACKEND", "OFFICIAL").upper()
     
     # Only needed for WEB backend
     if WHATSAPP_BACKEND != "WEB":
-        print("[INFO] Using OFFICIAL backend - no WhatsApp login required.")
+        logger.info("Using OFFICIAL backend - no WhatsApp login required.")
         return True
     
     print("=" * 50)
@@ -1245,15 +2122,13 @@ def check_whatsapp_login():
     
     # Check if profile exists (indicates previous login)
     if os.path.exists(profile_dir) and os.listdir(profile_dir):
-        print("[INFO] Existing WhatsApp session found. Verifying...")
+        logger.info("Existing WhatsApp session found. Verifying...")
     else:
-        print("[INFO] No WhatsApp session found. First-time login required!")
-        print("[INFO] Starting WhatsApp Web to generate QR code...")
+        logger.info("No WhatsApp session found. First-time login required!")
+        logger.info("Starting WhatsApp Web to generate QR code...")
     
     # Attempt to start session and verify/perform login
     try:
-        from playwright.sync_api import sync_playwright
-        
         context = web_client.start()
         
         if context.pages:
@@ -1264,7 +2139,7 @@ def check_whatsapp_login():
         page.set_default_timeout(120000)  # 2 minute timeout for login
         
         # Navigate to WhatsApp Web
-        print("[INFO] Opening WhatsApp Web...")
+        logger.info("Opening WhatsApp Web...")
         page.goto("https://web.whatsapp.com/")
         
         # Use the existing _ensure_loggedin method which handles QR flow
@@ -1274,19 +2149,19 @@ def check_whatsapp_login():
         
         if login_success:
             print("=" * 50)
-            print("[OK] WhatsApp login successful!")
-            print("[INFO] Session saved. Ready to start scheduler.")
+            logger.log(OK, "WhatsApp login successful!")
+            logger.info("Session saved. Ready to start scheduler.")
             print("=" * 50)
             return True
         else:
             print("=" * 50)
-            print("[ERROR] WhatsApp login failed!")
-            print("[INFO] Please restart and scan the QR code when prompted.")
+            logger.error("WhatsApp login failed!")
+            logger.info("Please restart and scan the QR code when prompted.")
             print("=" * 50)
             return False
             
     except Exception as e:
-        print(f"[ERROR] Login check failed: {e}")
+        logger.error("Login check failed: %s", e)
         try:
             web_client.stop()
         except:
@@ -1298,21 +2173,53 @@ def main():
     """Main execution function - runs in scheduler mode"""
     import sys
     
+    # Read .env once for the whole process
+    load_dotenv()
+    
+    # A typo in LOG_LEVEL should not keep the notifier from starting
+    log_level = os.getenv("LOG_LEVEL", "INFO").upper()
+    valid_level = log_level in logging.getLevelNamesMapping()
+    
+    # Messages are %-formatted lazily, only for records that pass the level check
+    logging.basicConfig(
+        level=log_level if valid_level else logging.INFO,
+        format="[%(levelname)s] %(message)s",
+        stream=sys.stdout,
+    )
+    if not valid_level:
+        logger.warning("Unknown LOG_LEVEL %r, using INFO", log_level)
+    
     # Check for --once flag to run just once (for testing or cron)
     if len(sys.argv) > 1 and sys.argv[1] == "--once":
-        print("[INFO] Running in single execution mode...")
-        load_dotenv()
+        logger.info("Running in single execution mode...")
         
         if send_cause_list():
-            print("[OK] Message sent successfully!")
+            mark_message_sent()
+            logger.log(OK, "Message sent successfully!")
         else:
-            print("[ERROR] Failed to send message or conditions not met")
+            logger.error("Failed to send message or conditions not met")
+    elif len(sys.argv) > 1 and sys.argv[1] == "--cron":
+        # One scheduler tick for cron/systemd timers: exit 0 once tonight's
+        # list is sent, 1 while it is still pending or outside the window
+        now = datetime.now(IST)
+        if was_message_sent_today(now):
+            logger.log(OK, "Message already sent today - Skipping")
+            sys.exit(0)
+        if not is_within_time_window(now=now):
+            logger.log(SKIP, "Outside active window (8:00 PM - 11:30 PM IST)")
+            sys.exit(1)
+        if send_cause_list(now):
+            mark_message_sent(now)
+            logger.log(OK, "Message sent successfully!")
+            sys.exit(0)
+        logger.info("Cause list not ready yet.")
+        sys.exit(1)
     else:
         # First-time setup: Check WhatsApp login before starting scheduler
-        print("[INFO] Checking WhatsApp login status...")
+        logger.info("Checking WhatsApp login status...")
         if not check_whatsapp_login():
-            print("[ERROR] Cannot start scheduler without WhatsApp login.")
-            print("[INFO] Please ensure you can access http://localhost:3000 to scan QR code.")
+            logger.error("Cannot start scheduler without WhatsApp login.")
+            logger.info("Please ensure you can access http://localhost:3000 to scan QR code.")
             sys.exit(1)
         
         # Run the scheduler
@@ -0,0 +1,47 @@
+import tempfile
+import unittest
+from datetime import datetime
+
+from main import IST, ScreenshotManager
+
+
+XML_DECLARATION = '<?xml version="1.0" encoding="utf-8"?>\n'
+
+
+class ExtractDateFromPageContentTests(unittest.TestCase):
+    def setUp(self):
+        self._cache_dir = tempfile.TemporaryDirectory()
+        self.manager = ScreenshotManager(target_url="https://example.invalid/", cache_dir=self._cache_dir.name)
+        self.today = datetime(2026, 10, 15, 21, 0, tzinfo=IST)
+
+    def tearDown(self):
+        self.manager.close()
+        self._cache_dir.cleanup()
+
+    def test_header_element_behind_xml_declaration(self):
+        # Nested markup in the header defeats the regex fast path, forcing the lxml parse
+        html_content = XML_DECLARATION + (
+            '<html><body><span id="ctl00_MainContent_lblHeader">'
+            '<b>Cause List for</b> 16-10-2026</span></body></html>'
+        )
+        self.assertEqual(
+            self.manager._extract_date_from_page_content(html_content, self.today),
+            datetime(2026, 10, 16),
+        )
+
+    def test_heading_strategy_behind_xml_declaration(self):
+        html_content = XML_DECLARATION + '<html><body><h2>Daily List 16/10/2026</h2></body></html>'
+        self.assertEqual(
+            self.manager._extract_date_from_page_content(html_content, self.today),
+            datetime(2026, 10, 16),
+        )
+
+    def test_header_only_ignores_stray_dates(self):
+        html_content = '<html><body><p>Updated 01-10-2026</p></body></html>'
+        self.assertIsNone(
+            self.manager._extract_date_from_page_content(html_content, self.today, header_only=True)
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,27 @@
+import unittest
+
+from main import parse_recipient_numbers
+
+
+class ParseRecipientNumbersTests(unittest.TestCase):
+    def test_formatted_numbers_are_normalised(self):
+        self.assertEqual(
+            parse_recipient_numbers("+91 98765 43210, +91-98765-43211, (0612) 1234567, 91.98765.43212"),
+            ["+919876543210", "+919876543211", "06121234567", "919876543212"],
+        )
+
+    def test_empty_and_invalid_entries_are_dropped(self):
+        self.assertEqual(
+            parse_recipient_numbers(" , 919876543210,, not-a-number, 12345,"),
+            ["919876543210"],
+        )
+
+    def test_duplicates_are_removed_after_normalising(self):
+        self.assertEqual(
+            parse_recipient_numbers("+91 98765 43210, +919876543210, +91-98765-43210, 06121234567"),
+            ["+919876543210", "06121234567"],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()